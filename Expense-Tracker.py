@@ -1,36 +1,26 @@
+import threading
 import tkinter as tk
+from tkinter import filedialog
 import customtkinter as ctk
 # from PIL import ImageTk, Image
-import mysql.connector
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import pandas as pd
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
 from datetime import datetime
-
-conn = mysql.connector.connect(
-    database="budget_planning",
-    user="root",
-    host="localhost",
-    password="",
-    port=3307,
-)
-
-def fetch_expense_data(userid):
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, userid, date, title, expense_type, amount, comment
-        FROM expense
-        WHERE userid = %s
-        ORDER BY date ASC
-    """, (userid,))
-    rows = cur.fetchall()
-    columns = [desc[0] for desc in cur.description]
-    df = pd.DataFrame(rows, columns=columns)    
-    # Ensure 'date' is datetime
-    df['date'] = pd.to_datetime(df['date'])
-    return df
+from storage import CATEGORIES, DASHBOARD_PARTS, connect_backend, page_key
+from periods import PERIODS, RANGE_HINT, period_bounds, period_label, trend_bucket
+from search import SEARCH_PAGE_SIZE, SearchCache, tokens
+from tasks import BackgroundExecutor, Preload, RefreshScheduler
+from ledger import LedgerGrid
+from exporter import ExportCancelled, export_csv
+from importer import ImportCancelled, import_csv
+from startup import preload_plotting
+from diagnostics import Diagnostics
+
+# Slow setup runs in the background while the login screen is up (see startup.py):
+# the storage backend (MySQL by default, set XPENSE_BACKEND=sqlite for the
+# embedded database) connects and migrates, and the charts' matplotlib stack loads.
+# Query timings, Tk loop lag and render times; Ctrl+Shift+D shows them
+diagnostics = Diagnostics()
+database = Preload(lambda: diagnostics.attach(connect_backend()), name="connect")
+Preload(preload_plotting, name="plotting")
 
 app = ctk.CTk()
 ctk.set_appearance_mode("dark")
@@ -39,6 +29,12 @@ ctk.set_default_color_theme("blue")
 app.title("Xpense")
 app.after(100, lambda: app.wm_state('zoomed')) # For immediate fullscreen when running the application
 
+# Database work runs off the Tk thread; results come back through app.after
+executor = BackgroundExecutor(app)
+
+# Cleanup callbacks for the logged-in dashboard (figures etc.), run on logout
+session_closers = []
+
 # Custom color palette
 PRIMARY_COLOR = "#39ace7"
 SECONDARY_COLOR = "#0784b5" 
@@ -46,6 +42,25 @@ DARK_COLOR = "#414c50"
 DARKER_COLOR = "#2d383c"
 DARKEST_COLOR = "#192428"
 
+# Ledger grid columns: (SQL sort column, heading)
+LEDGER_COLUMNS = [("id", "ID"), ("title", "Title"), ("amount", "Amount"),
+                  ("expense_type", "Category"), ("comment", "Comment")]
+
+# Pause in typing before the search box queries the database
+SEARCH_DELAY_MS = 200
+
+GRAPH_TAB = "📊 Graph"
+
+# Views a change can affect, and the dashboard_snapshot parts that redraw each
+VIEW_PARTS = {
+    "table": ("totals", "page"),  # the totals give the page count
+    "summary": ("totals",),
+    "pie": ("categories",),
+    "trend": ("trend",),
+}
+# Views on the Graph tab; skipped while it is hidden
+GRAPH_VIEWS = frozenset(("summary", "pie", "trend"))
+
 def clear_window():
     """Clear all widgets from the window"""
     for widget in app.winfo_children():
@@ -54,18 +69,29 @@ def clear_window():
 def logout_confirmation():
     """Show logout confirmation dialog"""
     if tk.messagebox.askyesno("Logout Confirmation", "Are you sure you want to logout?"):
+        executor.cancel_all()
+        while session_closers:
+            session_closers.pop()()
         first_page()
 
 def second_page(userid):
+    db = database.result()
     clear_window()
 
-    # Pagination Variables
-    records_per_page = 20
+    # Pagination Variables (the grid only draws visible rows, so pages can be large)
+    records_per_page = 100
     current_page = [0]  
+    sort_order = {"column": "id", "descending": True}
+    page_cursors = [None]  # page_cursors[n] = keyset cursor that fetches page n
+    table_requests = [0]  # bumped by every table load so older snapshots don't overwrite it
+    search_state = {"words": [], "job": None, "page": 0}  # words and result page shown, pending debounce
+    search_cache = SearchCache()
     
     # Variables to store references
     table_data = []
     selected_record_id = None
+    charts = None  # ChartManager, built the first time the Graph tab is opened
+    graph_dirty = True  # data changed since the Graph tab was last drawn
     
     # Create main container
     main_frame = ctk.CTkFrame(app, fg_color=DARKEST_COLOR)
@@ -80,6 +106,11 @@ def second_page(userid):
     welcome_label = ctk.CTkLabel(header_frame, text=f"Welcome, {userid}!", 
                                 font=("Arial", 16, "bold"), text_color="white")
     welcome_label.pack(side="left", padx=20, pady=15)
+
+    # Busy indicator while background queries are running
+    busy_label = ctk.CTkLabel(header_frame, text="", font=("Arial", 12), text_color="#CCCCCC")
+    busy_label.pack(side="left", padx=10, pady=15)
+    executor.on_busy = lambda busy: busy_label.configure(text="⏳ Loading..." if busy else "")
     
     # Logout button with confirmation
     logout_btn = ctk.CTkButton(header_frame, text="Logout", 
@@ -95,7 +126,7 @@ def second_page(userid):
     
     # Add tabs
     home_tab = tabview.add("🏠 Home")
-    graph_tab = tabview.add("📊 Graph")
+    graph_tab = tabview.add(GRAPH_TAB)
     
     # ==================== HOME TAB ====================
     def setup_home_tab():
@@ -141,10 +172,7 @@ def second_page(userid):
                                      font=("Arial", 12), text_color="white")
         category_label.grid(row=0, column=2, sticky="w", padx=5, pady=2)
         category_combobox = ctk.CTkComboBox(fields_frame, width=120,
-                                           values=["Income", "Allowance", "Supermarket", "Transport", "Shopping", 
-                                                  "Foods", "Drinks", "Restaurants", "Cafes", "Fast Food", "Online services",
-                                                  "Housing and utilities", "Transfers to other people",
-                                                  "Other"], fg_color=SECONDARY_COLOR)
+                                           values=list(CATEGORIES), fg_color=SECONDARY_COLOR)
         category_combobox.grid(row=1, column=2, padx=5, pady=5)
         
         comment_label = ctk.CTkLabel(fields_frame, text="Comment", 
@@ -169,38 +197,18 @@ def second_page(userid):
         table_frame = ctk.CTkFrame(home_tab, fg_color=DARK_COLOR)
         table_frame.pack(fill="both", expand=True, padx=10, pady=5)
         
-        # # Create scrollable frame for table with improved styling
-        # table_scroll = ctk.CTkScrollableFrame(table_frame, height=250, fg_color=DARKEST_COLOR, 
-        #                                     border_width=1, border_color="#666666")
-        # table_scroll.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        # Table headers with new color scheme (sticky)
-        headers = ["ID", "Title", "Amount", "Category", "Comment"]
-        header_frame = ctk.CTkFrame(table_frame, fg_color=SECONDARY_COLOR, 
-                                border_width=1, border_color="#666666")
-        header_frame.pack(fill="x", padx=10, pady=(0, 2))
-
-        for i, header in enumerate(headers):
-            label = ctk.CTkLabel(header_frame, text=header, font=("Arial", 12, "bold"), 
-                                text_color="#FFFFFF", width=100)
-            label.grid(row=0, column=i, padx=2, pady=8, sticky="ew")
-
-        for i in range(len(headers)):
-            header_frame.grid_columnconfigure(i, weight=1)
-
-        # Scrollable table (rows only, no header inside)
-        table_scroll = ctk.CTkScrollableFrame(table_frame, height=250, fg_color=DARKEST_COLOR, 
-                                            border_width=1, border_color="#666666")
-        table_scroll.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        # Ledger grid: sticky headers, click a header to sort (done in SQL)
+        ledger = LedgerGrid(table_frame, columns=LEDGER_COLUMNS,
+                            on_select=select_record, on_sort=sort_table,
+                            row_colors=(DARK_COLOR, DARKER_COLOR), heading_color=SECONDARY_COLOR,
+                            select_color=PRIMARY_COLOR, fg_color=DARKEST_COLOR,
+                            border_width=1, border_color="#666666")
+        ledger.pack(fill="both", expand=True, padx=10, pady=(0, 10))
 
         # Sticky pagination frame (always visible below the table)
         pagination_frame = ctk.CTkFrame(table_frame, fg_color="transparent")
         pagination_frame.pack(fill="x", padx=10, pady=(0, 10))
         
-        # Configure grid weights
-        for i in range(len(headers)):
-            header_frame.grid_columnconfigure(i, weight=1)
-        
         # Bottom buttons frame
         buttons_frame = ctk.CTkFrame(home_tab, fg_color="transparent", height=60)
         buttons_frame.pack(fill="x", padx=10, pady=5)
@@ -213,13 +221,14 @@ def second_page(userid):
         # Left side buttons
         show_all_btn = ctk.CTkButton(top_buttons, text="Show All", width=100, 
                                     fg_color=PRIMARY_COLOR, hover_color=SECONDARY_COLOR,
-                                    command=lambda: load_table_data(current_page[0]))
+                                    command=clear_search)
         show_all_btn.pack(side="left", padx=5)
         
-        search_btn = ctk.CTkButton(top_buttons, text="Search", width=100,
-                                  fg_color=PRIMARY_COLOR, hover_color=SECONDARY_COLOR,
-                                  command=search_records)
-        search_btn.pack(side="left", padx=5)
+        # Search as you type over title, category and comment
+        search_entry = ctk.CTkEntry(top_buttons, width=260,
+                                    placeholder_text="🔍 Search title, category or comment")
+        search_entry.pack(side="left", padx=5)
+        search_entry.bind("<KeyRelease>", schedule_search)
         
         # Right side button
         update_btn = ctk.CTkButton(top_buttons, text="Update Record", width=120,
@@ -241,39 +250,89 @@ def second_page(userid):
                                      width=160, command=remove_all_records)
         remove_all_btn.pack(side="right", padx=5)
         
-        return table_scroll, title_entry, price_entry, category_combobox, comment_entry, pagination_frame
+        return ledger, title_entry, price_entry, category_combobox, comment_entry, pagination_frame, search_entry
     
-    # --- Pandas-based sorting and exporting ---
-    def sort_expenses(df, column="amount", ascending=False):
-        """Sort expenses DataFrame by a column."""
-        return df.sort_values(by=column, ascending=ascending)
-
-    def export_expenses(df, filename="expenses_export.csv"):
-        """Export expenses DataFrame to CSV."""
-        df.to_csv(filename, index=False)
-        tk.messagebox.showinfo("Export", f"Data exported to {filename}")
-
-    def filter_expenses_by_period(df, period="month"):
-        """Filter expenses DataFrame by time period."""
-        now = pd.Timestamp.now()
-        if period == "day":
-            return df[df['date'].dt.date == now.date()]
-        elif period == "week":
-            return df[df['date'] >= now - pd.Timedelta(days=7)]
-        elif period == "month":
-            return df[df['date'].dt.month == now.month]
-        elif period == "quarter":
-            return df[df['date'].dt.quarter == now.quarter]
-        elif period == "halfyear":
-            # Jan-Jun if current month <= 6, else Jul-Dec
-            if now.month <= 6:
-                return df[df['date'].dt.month.isin(range(1, 7))]
+    # --- Streaming CSV export (runs on a worker thread) ---
+    export_cancel = threading.Event()
+    session_closers.append(export_cancel.set)
+
+    def export_expenses(filename, start=None, end=None):
+        """Stream the user's records dated in [start, end) to a CSV file with a progress bar."""
+        if export_buttons[0].cget("state") == "disabled":
+            return
+        export_cancel.clear()
+        for button in export_buttons:
+            button.configure(state="disabled")
+        export_progress.set(0)
+        export_progress.pack(side="left", padx=10)
+        export_cancel_btn.pack(side="left", padx=5)
+        report = executor.reporter(show_export_progress)
+
+        def finish():
+            export_progress.pack_forget()
+            export_cancel_btn.pack_forget()
+            for button in export_buttons:
+                button.configure(state="normal")
+
+        def on_done(count):
+            finish()
+            tk.messagebox.showinfo("Export", f"{count:,} records exported to {filename}")
+
+        def on_error(e):
+            finish()
+            if isinstance(e, ExportCancelled):
+                tk.messagebox.showinfo("Export", "Export cancelled")
             else:
-                return df[df['date'].dt.month.isin(range(7, 13))]
-        elif period == "year":
-            return df[df['date'].dt.year == now.year]
-        else:
-            return df
+                tk.messagebox.showerror("Export", f"Export failed: {e}")
+
+        executor.submit(None, lambda: export_csv(db, userid, filename, start, end,
+                                                 progress=report, cancel=export_cancel),
+                        on_done=on_done, on_error=on_error)
+
+    def show_export_progress(done, total):
+        export_progress.set(done / total if total else 1)
+
+    # --- Bulk CSV import (runs on a worker thread, shares the export progress bar) ---
+    def import_expenses():
+        """Import a CSV export or bank statement, then refresh the dashboard once."""
+        if export_buttons[0].cget("state") == "disabled":
+            return
+        filename = filedialog.askopenfilename(title="Import CSV",
+                                              filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not filename:
+            return
+        export_cancel.clear()
+        for button in export_buttons:
+            button.configure(state="disabled")
+        export_progress.set(0)
+        export_progress.pack(side="left", padx=10)
+        export_cancel_btn.pack(side="left", padx=5)
+        report = executor.reporter(show_export_progress)
+
+        def finish():
+            export_progress.pack_forget()
+            export_cancel_btn.pack_forget()
+            for button in export_buttons:
+                button.configure(state="normal")
+
+        def on_done(result):
+            finish()
+            if result.inserted:
+                refresh_scheduler.request()
+            message = result.summary()
+            if result.errors:
+                message += "\n\n" + "\n".join(f"Line {line}: {error}" for line, error in result.errors[:10])
+            tk.messagebox.showinfo("Import", message)
+
+        def on_error(e):
+            finish()
+            if isinstance(e, ImportCancelled):
+                tk.messagebox.showinfo("Import", "Import cancelled, nothing was added")
+            else:
+                tk.messagebox.showerror("Import", f"Import failed: {e}")
+
+        executor.submit(None, lambda: import_csv(db, userid, filename, progress=report, cancel=export_cancel),
+                        on_done=on_done, on_error=on_error)
 
     # --- Export & Sort UI for Home Tab ---
     export_frame = ctk.CTkFrame(home_tab, fg_color="transparent")
@@ -281,25 +340,36 @@ def second_page(userid):
 
     ctk.CTkLabel(export_frame, text="Export Expenses:", font=("Arial", 12, "bold"), text_color="white").pack(side="left", padx=(0,10))
 
-    # Dropdown for period selection
-    export_periods = ["Day", "Week", "Month", "Quarter", "Half-Year", "Year"]
-    export_dropdown = ctk.CTkComboBox(export_frame, values=export_periods, width=120)
+    # Dropdown for period selection; a custom range can be typed in instead
+    export_dropdown = ctk.CTkComboBox(export_frame, values=PERIODS, width=190)
     export_dropdown.set("Month")  # Default
     export_dropdown.pack(side="left", padx=2)
+    ctk.CTkLabel(export_frame, text=RANGE_HINT, font=("Arial", 11), text_color="gray").pack(side="left", padx=(6, 0))
 
-    # Export button
+    # Export button: the period becomes a date range in the SQL
     def export_selected_period():
-        period = export_dropdown.get().lower().replace("-", "").replace(" ", "")
-        df = fetch_expense_data(userid)
-        filtered = filter_expenses_by_period(df, period)
-        export_expenses(filtered, f"expenses_{period}.csv")
-    ctk.CTkButton(export_frame, text="Export", command=export_selected_period, width=90).pack(side="left", padx=10)
+        period = export_dropdown.get().strip()
+        try:
+            bounds = period_bounds(period)
+        except ValueError as e:
+            tk.messagebox.showerror("Export", str(e))
+            return
+        export_expenses(f"expenses_{period_label(period)}.csv", *bounds)
 
-    # Download CSV of current table
+    # Download CSV of the whole history
     def download_table_csv():
-        df = fetch_expense_data(userid)
-        export_expenses(df, "expenses_table.csv")
-    ctk.CTkButton(export_frame, text="Download CSV", command=download_table_csv, width=120).pack(side="left", padx=10)
+        export_expenses("expenses_table.csv")
+
+    export_buttons = [
+        ctk.CTkButton(export_frame, text="Export", command=export_selected_period, width=90),
+        ctk.CTkButton(export_frame, text="Download CSV", command=download_table_csv, width=120),
+        ctk.CTkButton(export_frame, text="Import CSV", command=import_expenses, width=110),
+    ]
+    for button in export_buttons:
+        button.pack(side="left", padx=10)
+    export_progress = ctk.CTkProgressBar(export_frame, width=160, progress_color=PRIMARY_COLOR)
+    export_cancel_btn = ctk.CTkButton(export_frame, text="Cancel", width=70, command=export_cancel.set,
+                                      fg_color="#f44336", hover_color="#da190b")
     
     # ==================== GRAPH TAB ====================
     def setup_graph_tab():
@@ -376,20 +446,74 @@ def second_page(userid):
 
         return chart_container, summary_frame
     
-    def calculate_balance():
-        """Calculate and update financial summary with calculation display"""
-        cur = conn.cursor()
-        
+    def graph_visible():
+        return charts is not None and tabview.get() == GRAPH_TAB
+
+    def refresh_dashboard(views=frozenset(VIEW_PARTS)):
+        """Fetch what the given views show in one round trip, then render them.
+
+        Called through refresh_scheduler, which merges the views of every
+        change made since the last idle pass. Views on a hidden Graph tab are
+        only marked dirty; the tab is redrawn when it is opened.
+        """
+        nonlocal graph_dirty
+        if not graph_visible():
+            graph_dirty = graph_dirty or bool(views & GRAPH_VIEWS)
+            views = views - GRAPH_VIEWS
+        page = current_page[0]
+        after = page_cursors[page]
+        wanted = {part for view in views for part in VIEW_PARTS[view]}
+        # While a search is shown the table is refreshed by re-running it instead
+        search_cache.clear()
+        if search_state["words"] and "table" in views:
+            wanted.discard("page")
+            run_search(force=True, page=search_state["page"])
+        trend_window, width = (None, None), 0
+        if "trend" in wanted:
+            trend_window = trend_bounds(charts.trend_period)
+            if trend_window is None:
+                wanted.discard("trend")
+            else:
+                width = charts.plot_width
+        parts = tuple(part for part in DASHBOARD_PARTS if part in wanted)
+        if not parts:
+            return
+        # Older requests for the same views are covered by this snapshot
+        if "page" in parts:
+            executor.cancel("table")
+            # Snapshots go under different keys, so a late one must not repaint a newer table
+            table_requests[0] += 1
+        request = table_requests[0]
+        if "trend" in parts:
+            executor.cancel("trend")
+        if GRAPH_VIEWS <= views:
+            graph_dirty = False
+
+        def render(snapshot):
+            if "summary" in views:
+                show_balance(snapshot["totals"][:2])
+            # Skip the table if the user paged, sorted or searched while this was loading
+            if "page" in snapshot and table_requests[0] == request:
+                render_table(page, snapshot["totals"][2], snapshot["page"])
+            if "categories" in snapshot:
+                draw_pie(snapshot["categories"])
+            if "trend" in snapshot:
+                draw_trend(snapshot["trend"])
+
+        executor.submit(("dashboard", parts), lambda: db.dashboard_snapshot(
+            userid, records_per_page, parts=parts, after=after,
+            order_by=sort_order["column"], descending=sort_order["descending"],
+            trend_window=trend_window, trend_bucket=pick_trend_bucket(trend_window, width)),
+            on_done=render, on_error=show_db_error)
+
+    refresh_scheduler = RefreshScheduler(app, refresh_dashboard, VIEW_PARTS)
+    session_closers.append(refresh_scheduler.cancel)
+
+    def show_balance(totals):
+        """Update financial summary with calculation display"""
         try:
-            # Calculate total income (Income + Allowance)
-            cur.execute("SELECT SUM(amount) FROM expense WHERE userid = %s AND expense_type IN ('Income', 'Allowance')", (userid,))
-            result = cur.fetchone()
-            total_income = float(result[0]) if result[0] is not None else 0.0
-            
-            # Calculate total expenses (everything except Income and Allowance)
-            cur.execute("SELECT SUM(amount) FROM expense WHERE userid = %s AND expense_type NOT IN ('Income', 'Allowance')", (userid,))
-            result = cur.fetchone()
-            total_expenses = float(result[0]) if result[0] is not None else 0.0
+            # Total income (Income + Allowance) and total expenses (everything else)
+            total_income, total_expenses = totals
             
             # Calculate balance
             balance = total_income - total_expenses
@@ -408,12 +532,15 @@ def second_page(userid):
             return total_income, total_expenses, balance
             
         except Exception as e:
-            print(f"Error calculating balance: {e}")
-            income_label.configure(text="₱0.00")
-            expense_label.configure(text="₱0.00")
-            calculation_label.configure(text="₱0.00 - ₱0.00 = ₱0.00")
-            balance_label.configure(text="₱0.00")
+            show_balance_error(e)
             return 0, 0, 0
+
+    def show_balance_error(e):
+        print(f"Error calculating balance: {e}")
+        income_label.configure(text="₱0.00")
+        expense_label.configure(text="₱0.00")
+        calculation_label.configure(text="₱0.00 - ₱0.00 = ₱0.00")
+        balance_label.configure(text="₱0.00")
     
     def add_record(title_entry, price_entry, category_combobox, comment_entry):
         """Add a new record to the database"""
@@ -432,118 +559,60 @@ def second_page(userid):
                 tk.messagebox.showerror("Error", "Amount must be greater than 0")
                 return
             
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO expense (userid, date, title, expense_type, amount, comment) VALUES (%s, %s, %s, %s, %s, %s)",
-                (userid, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), title, category, amount, comment),
-            )
-            conn.commit()
-            
+        except ValueError:
+            tk.messagebox.showerror("Error", "Please enter a valid amount (numbers only)")
+            return
+
+        def on_saved(_):
             # Clear entries
             title_entry.delete(0, ctk.END)
             price_entry.delete(0, ctk.END)
             category_combobox.set("")
             comment_entry.delete(0, ctk.END)
             
-            load_table_data(current_page[0])
-            update_chart()
-            calculate_balance()
+            refresh_scheduler.request()
             
             if category in ['Income', 'Allowance']:
                 tk.messagebox.showinfo("Success", f"{category} of ₱{amount:,.2f} added successfully!")
             else:
                 tk.messagebox.showinfo("Success", f"Expense of ₱{amount:,.2f} added successfully!")
-            
-        except ValueError:
-            tk.messagebox.showerror("Error", "Please enter a valid amount (numbers only)")
-        except Exception as e:
-            tk.messagebox.showerror("Error", f"Database error: {str(e)}")
+
+        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        executor.submit(None, lambda: db.add_expense(userid, title, category, amount, comment, date=date),
+                        on_done=on_saved, on_error=show_db_error)
+
+    def show_db_error(e):
+        tk.messagebox.showerror("Error", f"Database error: {str(e)}")
     
     def load_table_data(page=0):
-        """Load data into the table with pagination and improved styling"""
+        """Fetch a table page in the background; superseded requests are dropped"""
+        after = page_cursors[page]
+        table_requests[0] += 1
+        def fetch():
+            return db.count_expenses(userid), db.fetch_page(
+                userid, records_per_page, after,
+                order_by=sort_order["column"], descending=sort_order["descending"])
+        executor.submit("table", fetch,
+                        on_done=lambda result: render_table(page, *result),
+                        on_error=lambda e: print(f"Error loading table data: {e}"))
+
+    @diagnostics.timed("table")
+    def render_table(page, total_records, rows):
+        """Render a table page with pagination and improved styling"""
         nonlocal table_data
-        # Clear existing data
-        for widget in table_scroll.winfo_children():  # Keep header
-            widget.destroy()
-
-        cur = conn.cursor()
+        if page > 0 and not rows:
+            # The page emptied out (e.g. records were removed); start over
+            go_to_page(0)
+            return
         try:
-            cur.execute("SELECT COUNT(*) FROM expense WHERE userid = %s", (userid,))
-            total_records = cur.fetchone()[0]
             total_pages = max(1, (total_records + records_per_page - 1) // records_per_page)
-
-            offset = page * records_per_page
-            cur.execute(
-                "SELECT id, title, expense_type, amount, comment FROM expense WHERE userid = %s ORDER BY id DESC LIMIT %s OFFSET %s",
-                (userid, records_per_page, offset)
-            )
-            rows = cur.fetchall()
             table_data = rows
+            ledger.set_rows([format_row(row) for row in rows])
 
-            for i, row in enumerate(rows):
-                # Alternating row colors: even = DARK_COLOR, odd = DARKER_COLOR
-                row_bg_color = DARK_COLOR if i % 2 == 0 else DARKER_COLOR
-
-                row_frame = ctk.CTkFrame(table_scroll, fg_color=row_bg_color,
-                                        border_width=1, border_color="#666666")
-                row_frame.pack(fill="x", pady=1)
-
-                # Make row clickable
-                def on_row_click(record_id=row[0], row_index=i):
-                    nonlocal selected_record_id
-                    selected_record_id = record_id
-                    # Highlight selected row with PRIMARY_COLOR
-                    for j, widget in enumerate(table_scroll.winfo_children()[1:]):  # Exclude header
-                        if j == row_index:
-                            widget.configure(fg_color=PRIMARY_COLOR)
-                            for child in widget.winfo_children():
-                                if isinstance(child, ctk.CTkLabel):
-                                    if "Amount" not in child.cget("text") or (j == row_index and "₱" in child.cget("text")):
-                                        if "₱" in child.cget("text"):
-                                            if row[2] in ['Income', 'Allowance']:
-                                                child.configure(text_color="#2ECC71")
-                                            else:
-                                                child.configure(text_color="#E74C3C")
-                                        else:
-                                            child.configure(text_color="#FFFFFF")
-                        else:
-                            original_bg = DARK_COLOR if j % 2 == 0 else DARKER_COLOR
-                            widget.configure(fg_color=original_bg)
-                            for child in widget.winfo_children():
-                                if isinstance(child, ctk.CTkLabel):
-                                    child.configure(text_color="#FFFFFF")
-
-                row_frame.bind("<Button-1>", lambda e, record_id=row[0], row_index=i: on_row_click(record_id, row_index))
-
-                # Display: ID, Title, Amount, Category, Comment
-                amount_color = "#FFFFFF"
-                if row[2] in ['Income', 'Allowance']:
-                    amount_display = f"+₱{row[3]:,.2f}"
-                    amount_color = "#2ECC71"
-                else:
-                    amount_display = f"-₱{row[3]:,.2f}"
-                    amount_color = "#E74C3C"
-
-                data = [
-                    str(row[0]),
-                    row[1][:20] + "..." if len(row[1]) > 20 else row[1],
-                    amount_display,
-                    row[2],
-                    (row[4] or "No comment")[:15] + "..." if row[4] and len(row[4]) > 15 else (row[4] or "No comment")
-                ]
-
-                for j, value in enumerate(data):
-                    if j == 2:  # Amount column
-                        label = ctk.CTkLabel(row_frame, text=value, font=("Arial", 10, "bold"),
-                                            text_color=amount_color, width=100)
-                    else:
-                        label = ctk.CTkLabel(row_frame, text=value, font=("Arial", 10),
-                                            text_color="#FFFFFF", width=100)
-                    label.grid(row=0, column=j, padx=2, pady=6, sticky="ew")
-                    label.bind("<Button-1>", lambda e, record_id=row[0], row_index=i: on_row_click(record_id, row_index))
-
-                for j in range(len(data)):
-                    row_frame.grid_columnconfigure(j, weight=1)
+            # Remember where the next page starts
+            del page_cursors[page + 1:]
+            if len(rows) == records_per_page:
+                page_cursors.append(page_key(rows[-1], sort_order["column"]))
 
             # Sticky pagination controls (clear and re-create)
             for widget in pagination_frame.winfo_children():
@@ -567,90 +636,129 @@ def second_page(userid):
             next_btn = ctk.CTkButton(
                 pagination_frame, text="Next", width=80,
                 command=lambda: go_to_page(page + 1),
-                state="normal" if page < total_pages - 1 else "disabled"
+                state="normal" if page < total_pages - 1 and len(page_cursors) > page + 1 else "disabled"
             )
             next_btn.pack(side="left", padx=5)
 
         except Exception as e:
             print(f"Error loading table data: {e}")
-        
-        # Scroll to top after loading new page
-        try:
-            table_scroll._parent_canvas.yview_moveto(0)
-        except Exception:
-            pass
+
+    def format_row(row):
+        """Ledger grid entry for an (id, title, expense_type, amount, comment) row"""
+        # Display: ID, Title, Amount, Category, Comment
+        if row[2] in ['Income', 'Allowance']:
+            amount_display = f"+₱{row[3]:,.2f}"
+            kind = "income"
+        else:
+            amount_display = f"-₱{row[3]:,.2f}"
+            kind = "expense"
+
+        title = row[1] or ""
+        data = [
+            str(row[0]),
+            title[:20] + "..." if len(title) > 20 else title,
+            amount_display,
+            row[2],
+            (row[4] or "No comment")[:15] + "..." if row[4] and len(row[4]) > 15 else (row[4] or "No comment")
+        ]
+        return row[0], data, kind
+
+    def select_record(record_id):
+        nonlocal selected_record_id
+        selected_record_id = record_id
+
+    def sort_table(column, descending):
+        """Re-query the table with the clicked column pushed down to ORDER BY"""
+        sort_order["column"] = column
+        sort_order["descending"] = descending
+        del page_cursors[1:]
+        # Search results are ranked by relevance; sorting goes back to the ledger
+        if search_state["words"]:
+            search_entry.delete(0, ctk.END)
+            search_state["words"] = []
+            search_cache.clear()
+        go_to_page(0)
 
     def go_to_page(page):
-        if page < 0:
-            page = 0
+        # Keyset paging only knows the cursors of pages already visited
+        page = max(0, min(page, len(page_cursors) - 1))
         current_page[0] = page
         load_table_data(page)
     
-    def search_records():
-        """Search functionality"""
-        search_window = ctk.CTkToplevel(app)
-        search_window.title("Search Records")
-        search_window.geometry("400x200")
-        search_window.configure(fg_color=DARKER_COLOR)
-        
-        search_label = ctk.CTkLabel(search_window, text="Search by title, category, or comment:", 
-                                   font=("Arial", 14), text_color="white")
-        search_label.pack(pady=20)
-        
-        search_entry = ctk.CTkEntry(search_window, width=300, placeholder_text="Enter search term")
-        search_entry.pack(pady=10)
-        
-        def perform_search():
-            search_term = search_entry.get().strip()
-            if search_term:
-                # Clear existing data
-                for widget in table_scroll.winfo_children()[1:]:
-                    widget.destroy()
-                
-                cur = conn.cursor()
-                cur.execute(
-                    "SELECT id, title, expense_type, amount, comment FROM expense WHERE userid = %s AND (expense_type LIKE %s OR comment LIKE %s OR title LIKE %s) ORDER BY id DESC",
-                    (userid, f"%{search_term}%", f"%{search_term}%", f"%{search_term}%")
-                )
-                rows = cur.fetchall()
-                
-                for i, row in enumerate(rows):
-                    # Alternating row colors
-                    row_bg_color = DARK_COLOR if i % 2 == 0 else DARKER_COLOR
-                    
-                    row_frame = ctk.CTkFrame(table_scroll, fg_color=row_bg_color,
-                                           border_width=1, border_color="#666666")
-                    row_frame.pack(fill="x", pady=1)
-                    
-                    # Color coding for amount
-                    if row[2] in ['Income', 'Allowance']:
-                        amount_display = f"+₱{row[3]:,.2f}"
-                        amount_color = "#2ECC71"
-                    else:
-                        amount_display = f"-₱{row[3]:,.2f}"
-                        amount_color = "#E74C3C"
-                    
-                    data = [str(row[0]), row[1][:20] + "..." if len(row[1]) > 20 else row[1], 
-                           amount_display, row[2], (row[4] or "")[:15] + "..." if row[4] and len(row[4]) > 15 else (row[4] or "")]
-                    
-                    for j, value in enumerate(data):
-                        if j == 2:  # Amount column
-                            label = ctk.CTkLabel(row_frame, text=value, font=("Arial", 10, "bold"), 
-                                               text_color=amount_color, width=100)
-                        else:
-                            label = ctk.CTkLabel(row_frame, text=value, font=("Arial", 10), 
-                                               text_color="#FFFFFF", width=100)
-                        label.grid(row=0, column=j, padx=2, pady=6, sticky="ew")
-                    
-                    for j in range(len(data)):
-                        row_frame.grid_columnconfigure(j, weight=1)
-                
-                search_window.destroy()
-        
-        search_btn = ctk.CTkButton(search_window, text="Search", command=perform_search,
-                                  fg_color=PRIMARY_COLOR, hover_color=SECONDARY_COLOR)
-        search_btn.pack(pady=20)
-    
+    def schedule_search(event=None):
+        """Debounce keystrokes: search once typing pauses"""
+        if search_state["job"] is not None:
+            app.after_cancel(search_state["job"])
+        search_state["job"] = app.after(SEARCH_DELAY_MS, run_search)
+
+    def run_search(force=False, page=0):
+        """Show a page of matches for the search box, narrowing the cached result when the term only grew"""
+        search_state["job"] = None
+        term = search_entry.get()
+        words = tokens(term)
+        if words != search_state["words"]:
+            page = 0  # a new term starts from its best matches
+        elif page == search_state["page"] and not force:
+            return
+        search_state["words"] = words
+        search_state["page"] = page
+        if not words:
+            search_cache.clear()
+            go_to_page(current_page[0])
+            return
+        # Shares the "table" key so an outdated search or page load can't overwrite the results
+        table_requests[0] += 1
+        rows = search_cache.narrow(words, db.data_version(userid)) if page == 0 else None
+        if rows is not None:
+            executor.cancel("table")
+            show_search_results(rows)
+            return
+
+        def fetch():
+            # The version is read first, so results racing a write are filed as already stale
+            version = db.data_version(userid)
+            return version, db.search(userid, term, SEARCH_PAGE_SIZE + 1, offset=page * SEARCH_PAGE_SIZE)
+
+        def on_results(result):
+            version, rows = result
+            # One row past the page tells whether there is a next page
+            if page == 0:
+                search_cache.store(words, rows, SEARCH_PAGE_SIZE + 1, version)
+            show_search_results(rows[:SEARCH_PAGE_SIZE], page, more=len(rows) > SEARCH_PAGE_SIZE)
+
+        executor.submit("table", fetch, on_done=on_results, on_error=show_db_error)
+
+    @diagnostics.timed("search results")
+    def show_search_results(rows, page=0, more=False):
+        nonlocal table_data
+        table_data = rows
+        ledger.set_rows([format_row(row) for row in rows])
+        for widget in pagination_frame.winfo_children():
+            widget.destroy()
+        if page == 0 and not more:
+            summary = f"{len(rows)} match{'' if len(rows) == 1 else 'es'}"
+        else:
+            first = page * SEARCH_PAGE_SIZE + 1
+            summary = f"Matches {first}-{first + len(rows) - 1}" if rows else "No more matches"
+        ctk.CTkButton(pagination_frame, text="Previous", width=80,
+                      command=lambda: run_search(page=page - 1),
+                      state="normal" if page > 0 else "disabled").pack(side="left", padx=5)
+        ctk.CTkLabel(pagination_frame, text=summary, font=("Arial", 11, "bold"),
+                     text_color="white").pack(side="left", padx=10)
+        ctk.CTkButton(pagination_frame, text="Next", width=80,
+                      command=lambda: run_search(page=page + 1),
+                      state="normal" if more else "disabled").pack(side="left", padx=5)
+
+    def clear_search():
+        """Leave search mode and show the paged table again"""
+        if search_state["job"] is not None:
+            app.after_cancel(search_state["job"])
+        search_entry.delete(0, ctk.END)
+        search_state["words"] = []
+        search_state["page"] = 0
+        search_cache.clear()
+        go_to_page(current_page[0])
+
     def update_record(title_entry, price_entry, category_combobox, comment_entry):
         """Update selected record"""
         if not selected_record_id:
@@ -671,29 +779,28 @@ def second_page(userid):
             if amount <= 0:
                 tk.messagebox.showerror("Error", "Amount must be greater than 0")
                 return
-                
-            cur = conn.cursor()
-            cur.execute(
-                "UPDATE expense SET title = %s, expense_type = %s, amount = %s, comment = %s WHERE id = %s",
-                (title, category, amount, comment, selected_record_id)
-            )
-            conn.commit()
-            
+        except ValueError:
+            tk.messagebox.showerror("Error", "Please enter a valid amount (numbers only)")
+            return
+
+        def on_saved(_):
             # Clear entries
             title_entry.delete(0, ctk.END)
             price_entry.delete(0, ctk.END)
             category_combobox.set("")
             comment_entry.delete(0, ctk.END)
             
-            load_table_data(current_page[0])
-            update_chart()
-            calculate_balance()
+            # Renaming or re-commenting a record leaves the totals and charts as they were
+            if old is not None and (old[2], float(old[3])) == (category, amount):
+                refresh_scheduler.request("table")
+            else:
+                refresh_scheduler.request()
             tk.messagebox.showinfo("Success", "Record updated successfully!")
-            
-        except ValueError:
-            tk.messagebox.showerror("Error", "Please enter a valid amount (numbers only)")
-        except Exception as e:
-            tk.messagebox.showerror("Error", f"Database error: {str(e)}")
+
+        record_id = selected_record_id
+        old = next((row for row in table_data if row[0] == record_id), None)
+        executor.submit(None, lambda: db.update_expense(userid, record_id, title, category, amount, comment),
+                        on_done=on_saved, on_error=show_db_error)
     
     def remove_selected_record():
         """Remove selected record"""
@@ -702,303 +809,99 @@ def second_page(userid):
             return
         
         if tk.messagebox.askyesno("Confirm", "Are you sure you want to remove this record?"):
-            try:
-                cur = conn.cursor()
-                cur.execute("DELETE FROM expense WHERE id = %s", (selected_record_id,))
-                conn.commit()
-                
-                load_table_data(current_page[0])
-                update_chart()
-                calculate_balance()
+            def on_removed(_):
+                refresh_scheduler.request()
                 tk.messagebox.showinfo("Success", "Record removed successfully!")
-                
-            except Exception as e:
-                tk.messagebox.showerror("Error", f"Database error: {str(e)}")
+
+            record_id = selected_record_id
+            executor.submit(None, lambda: db.delete_expense(userid, record_id),
+                            on_done=on_removed, on_error=show_db_error)
     
     def remove_all_records():
         """Remove all records for user"""
         if tk.messagebox.askyesno("Confirm", "Are you sure you want to remove ALL records? This cannot be undone!"):
-            try:
-                cur = conn.cursor()
-                cur.execute("DELETE FROM expense WHERE userid = %s", (userid,))
-                conn.commit()
-                
-                load_table_data(current_page[0])
-                update_chart()
-                calculate_balance()
+            def on_removed(_):
+                refresh_scheduler.request()
                 tk.messagebox.showinfo("Success", "All records removed successfully!")
-                
-            except Exception as e:
-                tk.messagebox.showerror("Error", f"Database error: {str(e)}")
+
+            executor.submit(None, lambda: db.delete_all_expenses(userid),
+                            on_done=on_removed, on_error=show_db_error)
     
-    def update_chart():
-        """Update the pie chart and line graph for expense distribution and balance trend, with sorting controls."""
-        # Clear existing chart except the title
-        for widget in chart_frame.winfo_children():
-            widget.destroy()
+    def show_chart_error(e):
+        charts.show_error(f"Error loading chart: {str(e)}")
 
-        cur = conn.cursor()
+    @diagnostics.timed("pie update")
+    def draw_pie(categories):
         try:
-            # --- PIE CHART: Expense Distribution ---
-            cur.execute(
-                "SELECT expense_type, SUM(amount) FROM expense WHERE userid = %s AND expense_type NOT IN ('Income', 'Allowance') GROUP BY expense_type",
-                (userid,))
-            data = cur.fetchall()
-
-            labels = []
-            sizes = []
-            colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57',
-                    '#A569BD', '#F39C12', '#E74C3C', '#3498DB', '#2ECC71']
-
-            if data:
-                for i, (category, amount) in enumerate(data):
-                    labels.append(category)
-                    sizes.append(float(amount))
-
-                if len(labels) > len(colors):
-                    import itertools
-                    colors = list(itertools.islice(itertools.cycle(colors), len(labels)))
-
-                # Main horizontal frame for split layout
-                split_frame = ctk.CTkFrame(chart_frame, fg_color=DARKER_COLOR)
-                split_frame.pack(fill="both", expand=True, padx=20, pady=20)
-
-                # Left frame: Pie chart (70%)
-                left_frame = ctk.CTkFrame(split_frame, fg_color=DARK_COLOR, width=900, height =400)
-                left_frame.pack(side="left", fill="both", expand=True)
-                left_frame.pack_propagate(False)
-
-                # Right frame: Legend (30%)
-                right_frame = ctk.CTkFrame(split_frame, fg_color=DARK_COLOR, width=300)
-                right_frame.pack(side="right", fill="y")
-                right_frame.pack_propagate(False)
-
-                # --- Title above the pie chart, centered in left_frame ---
-                pie_title = ctk.CTkLabel(left_frame, text="📊 Expense Distribution", font=("Arial", 16, "bold"), text_color="white")
-                pie_title.pack(pady=(10, 10))
-
-
-                # Pie chart (no legend inside chart)
-                fig, ax = plt.subplots(figsize=(12, 10), facecolor=DARK_COLOR)
-                ax.set_facecolor(DARK_COLOR)
-                wedges, texts = ax.pie(
-                    sizes,
-                    labels=None,
-                    colors=colors[:len(labels)],
-                    autopct=None,
-                    startangle=90,
-                    shadow=True,
-                    explode=[0.05] * len(labels),
-                    wedgeprops={'linewidth': 2, 'edgecolor': 'white'}
-                )
-                ax.set_title("", pad=0)
-                plt.tight_layout()
-
-                canvas = FigureCanvasTkAgg(fig, master=left_frame)
-                canvas.draw()
-                canvas.get_tk_widget().pack(expand=True, fill="both", padx=10, pady=10)
-
-                # --- Tooltip for Pie Chart ---
-                tooltip = tk.Label(left_frame, bg="#222", fg="white", font=("Arial", 11), bd=1, relief="solid")
-                tooltip.place_forget()
-
-                def on_motion(event):
-                    found = False
-                    for i, wedge in enumerate(wedges):
-                        if wedge.contains_point([event.x, event.y]):
-                            tooltip.config(text=f"{labels[i]}: ₱{sizes[i]:,.2f}")
-                            tooltip.place(x=event.x + 10, y=event.y + 10)
-                            found = True
-                            break
-                    if not found:
-                        tooltip.place_forget()
-
-                canvas.mpl_connect("motion_notify_event", on_motion)
-
-                # Legend on right frame (all visible, scrollable if needed)
-                legend_title = ctk.CTkLabel(right_frame, text="🗂️ Expense Categories", font=("Arial", 14, "bold"), text_color="white")
-                legend_title.pack(pady=(20, 10))
-
-                legend_scroll = ctk.CTkScrollableFrame(right_frame, fg_color=DARK_COLOR, width=300, height=300)
-                legend_scroll.pack(fill="both", expand=True, padx=10, pady=10)
-
-                for i, (label, size) in enumerate(zip(labels, sizes)):
-                    row = ctk.CTkFrame(legend_scroll, fg_color="transparent")
-                    row.pack(fill="x", pady=4)
-                    color_box = ctk.CTkLabel(row, text="", width=20, height=20, fg_color=colors[i])
-                    color_box.pack(side="left", padx=(0, 8))
-                    legend_label = ctk.CTkLabel(
-                        row,
-                        text=f"{label}: ₱{size:,.0f}",
-                        font=("Arial", 12),
-                        text_color="white",
-                        anchor="w"
-                    )
-                    legend_label.pack(side="left", fill="x", expand=True)
-            else:
-                no_data_label = ctk.CTkLabel(chart_frame, text="No expense data available\nAdd some expenses to see the chart",
-                                            font=("Arial", 16), text_color="white")
-                no_data_label.pack(expand=True)
-
-            # --- BALANCE TREND SORT CONTROLS ---
-            sort_frame = ctk.CTkFrame(chart_frame, fg_color="transparent")
-            sort_frame.pack(fill="x", padx=20, pady=(0, 0))
-
-            ctk.CTkLabel(sort_frame, text="Sort Balance Trend by:", font=("Arial", 12, "bold"), text_color="white").pack(side="left", padx=(0,10))
-
-            trend_periods = ["Day", "Week", "Month", "Year"]
-            trend_dropdown = ctk.CTkComboBox(sort_frame, values=trend_periods, width=120)
-            trend_dropdown.set("Month")
-            trend_dropdown.pack(side="left", padx=2)
-
-            # --- Dedicated container for balance trend chart ---
-            balance_trend_container = ctk.CTkFrame(chart_frame, fg_color="transparent")
-            balance_trend_container.pack(fill="x", padx=0, pady=(0, 0))
-
-            def filter_balance_trend(records, period):
-                df = pd.DataFrame(records, columns=["date", "amount", "expense_type"])
-                df["date"] = pd.to_datetime(df["date"])
-                now = pd.Timestamp.now()
-                if period == "Day":
-                    df = df[df["date"].dt.date == now.date()]
-                elif period == "Week":
-                    df = df[df["date"] >= now - pd.Timedelta(days=7)]
-                elif period == "Month":
-                    df = df[df["date"].dt.month == now.month]
-                elif period == "Year":
-                    df = df[df["date"].dt.year == now.year]
-                return df.values.tolist()
-
-            def draw_balance_trend(records):
-                # Clear previous chart in container
-                for widget in balance_trend_container.winfo_children():
-                    widget.destroy()
-
-                # Create a dedicated frame for the line chart (always)
-                balance_trend_frame = ctk.CTkFrame(balance_trend_container, fg_color=DARK_COLOR)
-                balance_trend_frame.pack(fill="x", padx=20, pady=(0, 10))
-
-                # Centered header (always)
-                balance_header = ctk.CTkLabel(balance_trend_frame, text="📈 Balance Trend", font=("Arial", 18, "bold"), text_color="white")
-                balance_header.pack(pady=(10, 0), fill="x")
-
-                if records:
-                    dates = []
-                    balances = []
-                    total = 0.0
-                    for row in records:
-                        dt = pd.to_datetime(row[0])
-                        amount = float(row[1])
-                        if row[2] in ('Income', 'Allowance'):
-                            total += amount
-                        else:
-                            total -= amount
-                        dates.append(dt)
-                        balances.append(total)
-
-                    fig2, ax2 = plt.subplots(figsize=(7, 3), facecolor=DARK_COLOR)
-                    ax2.set_facecolor(DARK_COLOR)
-                    ax2.plot(
-                        dates,
-                        balances,
-                        marker='o',
-                        markersize=8,
-                        markerfacecolor='#39ace7',
-                        markeredgecolor='white',
-                        color='#39ace7',
-                        linewidth=2,
-                        label='Balance'
-                    )
-                    ax2.axhline(0, color='#E74C3C', linestyle='--', linewidth=2, label='Limit (₱0)')
-                    ax2.set_title("", pad=0)
-                    ax2.set_ylabel("Balance (₱)", color='white')
-                    ax2.set_xlabel("Date", color='white')
-                    ax2.tick_params(axis='x', labelrotation=45, colors='white')
-                    ax2.tick_params(axis='y', colors='white')
-                    ax2.legend(facecolor=DARK_COLOR, edgecolor='white', fontsize=10)
-                    ax2.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-                    ax2.xaxis.set_major_locator(mdates.AutoDateLocator())
-                    fig2.autofmt_xdate()
-                    fig2.tight_layout()
-
-                    canvas2 = FigureCanvasTkAgg(fig2, master=balance_trend_frame)
-                    canvas2.draw()
-                    canvas2.get_tk_widget().pack(expand=True, fill="both", padx=10, pady=10)
-
-                    # Add interactive toolbar below the line graph
-                    toolbar = NavigationToolbar2Tk(canvas2, balance_trend_frame)
-                    toolbar.update()
-                    toolbar.pack(fill="x", padx=10, pady=(0, 10))
-
-                    # --- Tooltip for Line Graph ---
-                    tooltip_line = tk.Label(balance_trend_frame, bg="#222", fg="white", font=("Arial", 11), bd=1, relief="solid")
-                    tooltip_line.place_forget()
-
-                    def on_line_motion(event):
-                        found = False
-                        if event.inaxes == ax2:
-                            mouse_x, mouse_y = event.xdata, event.ydata
-                            if mouse_x is not None and mouse_y is not None:
-                                for i, (x, y) in enumerate(zip(dates, balances)):
-                                    x_val = ax2.transData.transform((mdates.date2num(x), float(y)))
-                                    mouse_val = (event.x, event.y)
-                                    dist = ((x_val[0] - mouse_val[0]) ** 2 + (x_val[1] - mouse_val[1]) ** 2) ** 0.5
-                                    if dist < 20:
-                                        tooltip_line.config(text=f"{x.strftime('%Y-%m-%d %H:%M:%S')}: ₱{y:,.2f}")
-                                        tooltip_line.place(x=event.x + 10, y=event.y + 10)
-                                        found = True
-                                        break
-                        if not found:
-                            tooltip_line.place_forget()
-
-                    canvas2.mpl_connect("motion_notify_event", on_line_motion)
-
-                else:
-                    # Show "No data" message but keep header and controls
-                    no_data_label2 = ctk.CTkLabel(balance_trend_frame, text="No balance trend data available.",
-                                                font=("Arial", 12), text_color="white")
-                    no_data_label2.pack(pady=30)
-
-            def refresh_balance_trend():
-                selected_period = trend_dropdown.get()
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT date, amount, expense_type
-                    FROM expense
-                    WHERE userid = %s
-                    ORDER BY date ASC, id ASC
-                """, (userid,))
-                all_records = cur.fetchall()
-                filtered_records = filter_balance_trend(all_records, selected_period)
-                draw_balance_trend(filtered_records)
-
-            sort_btn = ctk.CTkButton(sort_frame, text="Sort", command=refresh_balance_trend, width=80, fg_color=PRIMARY_COLOR, hover_color=SECONDARY_COLOR)
-            sort_btn.pack(side="left", padx=10)
-
-            # Initial draw with all records (default period)
-            cur.execute("""
-                SELECT date, amount, expense_type
-                FROM expense
-                WHERE userid = %s
-                ORDER BY date ASC, id ASC
-            """, (userid,))
-            all_records = cur.fetchall()
-            filtered_records = filter_balance_trend(all_records, trend_dropdown.get())
-            draw_balance_trend(filtered_records)
+            charts.update_pie(categories)
+        except Exception as e:
+            show_chart_error(e)
 
+    @diagnostics.timed("trend update")
+    def draw_trend(trend):
+        """Update the balance trend for the selected period."""
+        try:
+            charts.update_trend([date for date, _ in trend], [balance for _, balance in trend])
         except Exception as e:
-            error_label = ctk.CTkLabel(chart_frame, text=f"Error loading chart: {str(e)}",
-                                    font=("Arial", 16), text_color="#E74C3C")
-            error_label.pack(expand=True)
+            show_chart_error(e)
+
+    def trend_bounds(period):
+        """[start, end) of a trend period, or None (with an error shown) for a malformed custom range."""
+        try:
+            return period_bounds(period.strip())
+        except ValueError as e:
+            show_chart_error(e)
+            return None
+
+    def pick_trend_bucket(window, width):
+        """trend_bucket() for window; call it on a worker, an open start looks up the oldest record."""
+        first = db.first_record_date(userid) if window[0] is None and width > 0 else None
+        return trend_bucket(*window, width, first=first)
+
+    def refresh_balance_trend(period):
+        trend_window = trend_bounds(period)
+        if trend_window is None:
+            return
+        width = charts.plot_width
+        executor.submit("trend", lambda: db.balance_trend(userid, *trend_window, pick_trend_bucket(trend_window, width)),
+                        on_done=draw_trend, on_error=show_chart_error)
+
+    def load_trend_detail(start, end, points):
+        """Re-fetch the trend at the resolution of the zoomed or panned view."""
+        bucket = trend_bucket(start, end, points)
+
+        def show(trend):
+            charts.show_trend_detail([date for date, _ in trend], [balance for _, balance in trend])
+
+        executor.submit("trend", lambda: db.balance_trend(userid, start, end, bucket),
+                        on_done=show, on_error=show_chart_error)
     
-    # Setup tabs
-    table_scroll, title_entry, price_entry, category_combobox, comment_entry, pagination_frame = setup_home_tab()
-    chart_frame, balance_frame = setup_graph_tab()
+    def build_graph_tab():
+        nonlocal charts
+        from charts import ChartManager  # preloaded during login; waits for that import if still running
+        chart_frame, _ = setup_graph_tab()
+        charts = ChartManager(chart_frame, on_trend_period=refresh_balance_trend, on_trend_view=load_trend_detail,
+                              dark_color=DARK_COLOR, darker_color=DARKER_COLOR,
+                              primary_color=PRIMARY_COLOR, secondary_color=SECONDARY_COLOR)
+        session_closers.append(charts.close)
+        diagnostics.time_canvas(charts.pie_canvas, "pie")
+        diagnostics.time_canvas(charts.trend_canvas, "trend")
+
+    def on_tab_change():
+        """Build the Graph tab on first visit and redraw it only if the data changed while it was hidden."""
+        if tabview.get() != GRAPH_TAB:
+            return
+        if charts is None:
+            build_graph_tab()
+        if graph_dirty:
+            refresh_scheduler.request(*GRAPH_VIEWS)
+
+    # Setup tabs (the Graph tab is built when it is first opened)
+    ledger, title_entry, price_entry, category_combobox, comment_entry, pagination_frame, search_entry = setup_home_tab()
+    tabview.configure(command=on_tab_change)
     
     # Load initial data
-    load_table_data(current_page[0])
-    update_chart()
-    calculate_balance()
+    refresh_scheduler.request()
 
 def signUp_page():
     clear_window()
@@ -1015,18 +918,13 @@ def signUp_page():
             tk.messagebox.showerror("Error", "Please fill in all fields")
             return
 
-        cur = conn.cursor()
         try:
-            cur.execute("SELECT userid FROM userinfo WHERE userid = %s", (get_userid,))
-            if cur.fetchone():
+            db = database.result()
+            if db.user_exists(get_userid):
                 tk.messagebox.showerror("Sign Up", "User ID is already taken")
                 return
                 
-            cur.execute(
-                "INSERT INTO userinfo (userid, password, user_name) VALUES (%s, %s, %s)",
-                (get_userid, get_password, get_name),
-            )
-            conn.commit()
+            db.create_user(get_userid, get_password, get_name)
             tk.messagebox.showinfo("Success", "Account created successfully!")
             second_page(get_userid)
         except Exception as e:
@@ -1112,13 +1010,10 @@ def first_page():
             tk.messagebox.showerror("Error", "Please fill in all fields")
             return
 
-        cur = conn.cursor()
         try:
-            # First check if user exists
-            cur.execute("SELECT userid FROM userinfo WHERE userid = %s", (get_userid,))
-            user_exists = cur.fetchone()
-            
-            if not user_exists:
+            # First check if user exists (waits for the background connection if needed)
+            db = database.result()
+            if not db.user_exists(get_userid):
                 # User doesn't exist in database
                 result = tk.messagebox.askyesno("User Not Found", 
                                               "User isn't found. Would you like to create an account?")
@@ -1127,11 +1022,7 @@ def first_page():
                 return
             
             # User exists, now check password
-            cur.execute("SELECT userid, password FROM userinfo WHERE userid = %s AND password = %s", 
-                       (get_userid, get_password))
-            user = cur.fetchone()
-            
-            if user:
+            if db.check_login(get_userid, get_password):
                 second_page(get_userid)
             else:
                 tk.messagebox.showerror("Login Error", "Invalid password. Please try again.")
@@ -1203,9 +1094,51 @@ def first_page():
                               hover_color="#ECF0F1", border_width=2, border_color=SECONDARY_COLOR)
     signup_btn.pack()
 
+def show_diagnostics(event=None):
+    """Hidden diagnostics panel (Ctrl+Shift+D): query timings, slow queries, loop lag, render times."""
+    window = diagnostics_window.get("window")
+    if window is not None and window.winfo_exists():
+        window.lift()
+        return
+    window = ctk.CTkToplevel(app)
+    window.title("Xpense diagnostics")
+    window.geometry("980x560")
+    diagnostics_window["window"] = window
+
+    text = ctk.CTkTextbox(window, font=("Courier", 12), wrap="none")
+    text.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+
+    def refresh():
+        if not window.winfo_exists():
+            return
+        text.configure(state="normal")
+        text.delete("1.0", "end")
+        text.insert("1.0", diagnostics.summary())
+        text.configure(state="disabled")
+        window.after(1000, refresh)
+
+    def save():
+        filename = filedialog.asksaveasfilename(parent=window, title="Save diagnostics", defaultextension=".json",
+                                                initialfile="xpense-diagnostics.json",
+                                                filetypes=[("JSON files", "*.json")])
+        if filename:
+            try:
+                diagnostics.dump(filename)
+            except OSError as e:
+                tk.messagebox.showerror("Diagnostics", f"Could not save: {e}", parent=window)
+
+    buttons = ctk.CTkFrame(window, fg_color="transparent")
+    buttons.pack(fill="x", padx=10, pady=(0, 10))
+    ctk.CTkButton(buttons, text="Save JSON...", width=120, command=save).pack(side="right", padx=5)
+    refresh()
+
+diagnostics_window = {}
+
 # Start the application
 if __name__ == "__main__":
     try:
+        app.bind_all("<Control-Shift-D>", show_diagnostics)
+        diagnostics.start_heartbeat(app)
         first_page()
         app.protocol("WM_DELETE_WINDOW", app.quit)  # Graceful exit
         app.mainloop()
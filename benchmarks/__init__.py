@@ -0,0 +1,15 @@
+"""Reproducible benchmarks for Xpense.
+
+    python -m benchmarks run [--backend sqlite|mysql] [--users N] [--years N] [--out FILE]
+    python -m benchmarks compare BASE.json NEW.json [--threshold 1.2] [--min-delta-ms 0.5]
+
+generate.py builds a seeded synthetic ledger (users, years of history, the
+app's real categories) through the normal storage backend; the same seed
+always produces the same rows. scenarios.py times every data path the app
+uses against it and the results are written as JSON, so two runs (say,
+before and after a change) can be compared with `compare`.
+
+By default the ledger lives in a temporary SQLite file. With --backend
+mysql it is written to the database in MYSQL_CONFIG: use a scratch
+database, as the benchmark users are left in place for later runs.
+"""
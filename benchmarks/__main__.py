@@ -0,0 +1,145 @@
+"""Command line for the benchmark suite (python -m benchmarks --help)."""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.generate import generate
+from benchmarks.scenarios import scenarios, time_scenario
+from storage import connect_backend
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                              ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def cmd_run(args):
+    options = {}
+    temporary = None
+    if args.backend == "sqlite":
+        if args.db is None:
+            temporary = tempfile.mkdtemp(prefix="xpense-bench-")
+            args.db = os.path.join(temporary, "bench.db")
+        options["path"] = args.db
+    db = connect_backend(args.backend, **options)
+    # Time the database, not the query cache; one scenario measures the cache on purpose
+    cache, db.cache = db.cache, None
+    try:
+        start = time.perf_counter()
+        users = generate(db, args.users, args.years, args.seed, args.scale)
+        print(f"Ledger: {len(users)} users, {sum(count for _, count in users):,} records "
+              f"({time.perf_counter() - start:.1f} s)", file=sys.stderr)
+        # The busiest user is the worst case the UI has to handle
+        userid = max(users, key=lambda user: user[1])[0]
+        results = {}
+        for name, run in scenarios(db, userid):
+            if args.only and not any(word in name for word in args.only):
+                continue
+            repeat = 1 if name.startswith("export") else args.repeat
+            results[name] = time_scenario(run, repeat)
+            print(f"{results[name]['median_ms']:10.2f} ms  {name}", file=sys.stderr)
+        if cache is not None:
+            db.cache = cache
+            snapshot = dict(scenarios(db, userid))["dashboard snapshot"]
+            results["dashboard snapshot (cached)"] = time_scenario(snapshot, args.repeat)
+    finally:
+        db.close()
+        if temporary is not None:
+            for name in os.listdir(temporary):
+                os.remove(os.path.join(temporary, name))
+            os.rmdir(temporary)
+
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "seed": args.seed,
+            "users": args.users,
+            "years": args.years,
+            "scale": args.scale,
+            "records": dict(users)[userid],
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+def cmd_compare(args):
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    for key in ("backend", "seed", "users", "years", "scale"):
+        if base["meta"].get(key) != new["meta"].get(key):
+            print(f"warning: {key} differs ({base['meta'].get(key)} vs {new['meta'].get(key)})")
+    regressions = 0
+    print(f"{'base ms':>10} {'new ms':>10} {'ratio':>7}  scenario")
+    for name, result in new["results"].items():
+        if name not in base["results"]:
+            print(f"{'-':>10} {result['median_ms']:10.2f} {'new':>7}  {name}")
+            continue
+        before, after = base["results"][name]["median_ms"], result["median_ms"]
+        ratio = after / before if before else float("inf")
+        flag = ""
+        # Sub-millisecond scenarios are too noisy to judge by ratio alone
+        if ratio > args.threshold and after - before > args.min_delta_ms:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{before:10.2f} {after:10.2f} {ratio:7.2f}  {name}{flag}")
+    print(f"{regressions} scenario(s) slower than {args.threshold}x and {args.min_delta_ms} ms")
+    return 1 if regressions else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Xpense benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="generate a ledger and time every scenario")
+    run.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    run.add_argument("--db", help="SQLite file to use and keep (default: a temporary one)")
+    run.add_argument("--users", type=int, default=10)
+    run.add_argument("--years", type=int, default=5)
+    run.add_argument("--scale", type=float, default=1.0, help="multiplies records per month")
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument("--repeat", type=int, default=5, help="timed runs per scenario (export runs once)")
+    run.add_argument("--only", nargs="*", help="only scenarios whose name contains one of these words")
+    run.add_argument("--out", help="write the JSON report here instead of stdout")
+    run.set_defaults(func=cmd_run)
+
+    compare = commands.add_parser("compare", help="compare two JSON reports")
+    compare.add_argument("base")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=1.2,
+                         help="fail when a median is more than this many times slower (default 1.2)")
+    compare.add_argument("--min-delta-ms", type=float, default=0.5,
+                         help="ignore slowdowns smaller than this many milliseconds (default 0.5)")
+    compare.set_defaults(func=cmd_compare)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
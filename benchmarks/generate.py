@@ -0,0 +1,92 @@
+"""Seeded synthetic ledgers for benchmarks."""
+import random
+from datetime import datetime, timedelta
+
+from storage import CATEGORIES, INCOME_TYPES
+
+# History ends here rather than at today, so a seed always means the same rows
+END_DATE = datetime(2025, 1, 1)
+
+USER_PREFIX = "bench"
+
+# Titles per category; a record's title is one of these, sometimes with a suffix
+TITLES = {
+    "Income": ("Salary", "Freelance project", "Bonus", "Interest"),
+    "Allowance": ("Allowance", "Family support", "Stipend"),
+    "Supermarket": ("Groceries", "Supermarket run", "Weekly shopping", "Fruit and vegetables"),
+    "Transport": ("Jeepney fare", "Taxi", "Fuel", "Train ticket", "Bus fare"),
+    "Shopping": ("Clothes", "Shoes", "Electronics", "Home goods", "Gift"),
+    "Foods": ("Bakery", "Market food", "Snacks"),
+    "Drinks": ("Milk tea", "Beer", "Juice", "Soft drinks"),
+    "Restaurants": ("Dinner out", "Lunch with friends", "Birthday dinner"),
+    "Cafes": ("Coffee", "Cafe latte", "Breakfast at cafe"),
+    "Fast Food": ("Burger", "Fried chicken", "Pizza", "Fries"),
+    "Online services": ("Streaming subscription", "Cloud storage", "Mobile load", "App purchase"),
+    "Housing and utilities": ("Rent", "Electricity bill", "Water bill", "Internet bill"),
+    "Transfers to other people": ("Sent to family", "Paid back friend", "Gift money"),
+    "Other": ("Miscellaneous", "Pharmacy", "Haircut", "Donation"),
+}
+
+# (typical amount, records per month) per category
+SPENDING = {
+    "Supermarket": (1800, 6), "Transport": (120, 25), "Shopping": (1500, 2), "Foods": (150, 10),
+    "Drinks": (120, 8), "Restaurants": (900, 3), "Cafes": (180, 6), "Fast Food": (250, 6),
+    "Online services": (400, 3), "Housing and utilities": (3500, 3),
+    "Transfers to other people": (2000, 1), "Other": (300, 3),
+}
+
+COMMENTS = ("paid by card", "cash", "shared with friends", "monthly", "discounted", "supermarket near home")
+
+
+def user_id(index):
+    return f"{USER_PREFIX}{index:04d}"
+
+
+def user_records(rng, years, end=END_DATE, scale=1.0):
+    """Rows (date, title, expense_type, amount, comment) for one user, oldest first."""
+    start = end - timedelta(days=365 * years)
+    salary = rng.randint(18, 90) * 1000
+    rows = []
+    month = datetime(start.year, start.month, 1)
+    while month < end:
+        next_month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+        days = (min(next_month, end) - month).days
+        for payday in (15, 30):
+            if payday <= days:
+                rows.append((month + timedelta(days=payday - 1, hours=9), "Salary", INCOME_TYPES[0],
+                             round(salary / 2, 2), None))
+        if rng.random() < 0.3:
+            rows.append((month + timedelta(days=rng.randrange(days), hours=12), rng.choice(TITLES["Allowance"]),
+                         "Allowance", float(rng.randint(5, 50) * 100), None))
+        for category, (typical, per_month) in SPENDING.items():
+            for _ in range(rng.randint(0, round(2 * per_month * scale))):
+                when = month + timedelta(seconds=rng.randrange(days * 86400))
+                title = rng.choice(TITLES[category])
+                if rng.random() < 0.2:
+                    title = f"{title} #{rng.randint(1, 999)}"
+                amount = round(typical * rng.lognormvariate(0, 0.5), 2)
+                comment = rng.choice(COMMENTS) if rng.random() < 0.3 else None
+                rows.append((when, title, category, amount, comment))
+        month = next_month
+    rows.sort(key=lambda row: row[0])
+    return rows
+
+
+def generate(backend, users=10, years=5, seed=1, scale=1.0):
+    """Create users bench0000.. with seeded histories; returns [(userid, record count)].
+
+    Users that already exist are kept as they are, so a ledger generated
+    once can be reused by later runs with the same settings.
+    """
+    assert set(TITLES) == set(CATEGORIES), "TITLES must cover every category"
+    created = []
+    for index in range(users):
+        userid = user_id(index)
+        if backend.user_exists(userid):
+            created.append((userid, backend.count_expenses(userid)))
+            continue
+        rng = random.Random(f"{seed}:{index}")
+        backend.create_user(userid, f"pw-{userid}", f"Benchmark user {index}")
+        count = backend.insert_expenses(userid, user_records(rng, years, scale=scale))
+        created.append((userid, count))
+    return created
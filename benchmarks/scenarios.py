@@ -0,0 +1,96 @@
+"""Timed scenarios, one per data path the app uses."""
+import os
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from benchmarks.generate import END_DATE
+from exporter import export_csv
+from periods import trend_bucket
+from storage import page_key
+
+# Rows per table page, as in Expense-Tracker.py
+PAGE_SIZE = 100
+
+# Trend plot width in pixels assumed when picking a bucket
+PLOT_WIDTH = 900
+
+# Month and year windows at the end of the generated history
+MONTH = (END_DATE - timedelta(days=31), END_DATE)
+YEAR = (END_DATE - timedelta(days=365), END_DATE)
+
+
+def _deep_key(db, userid, order_by, fraction=0.9):
+    """Keyset cursor of the row `fraction` of the way through the user's ledger."""
+    rows = [row for chunk in db.iter_expenses(userid) for row in chunk]
+    if not rows:
+        return None
+    row = sorted(rows, key=lambda r: (r[{"id": 0, "amount": 5}[order_by]], r[0]),
+                 reverse=True)[int(len(rows) * fraction)]
+    # iter_expenses rows are EXPENSE_COLUMNS; page_key wants table page rows
+    return page_key((row[0], row[3], row[4], row[5], row[6]), order_by)
+
+
+def _export(db, userid):
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        return export_csv(db, userid, path)
+    finally:
+        os.remove(path)
+
+
+def scenarios(db, userid):
+    """[(name, function)] for userid; functions return something sized (rows) or a count."""
+    deep_id = _deep_key(db, userid, "id")
+    deep_amount = _deep_key(db, userid, "amount")
+    return [
+        ("login", lambda: db.check_login(userid, f"pw-{userid}")),
+        ("table page (first)", lambda: db.fetch_page(userid, PAGE_SIZE)),
+        ("table page (deep)", lambda: db.fetch_page(userid, PAGE_SIZE, after=deep_id)),
+        ("table page (deep, by amount)", lambda: db.fetch_page(
+            userid, PAGE_SIZE, after=deep_amount, order_by="amount")),
+        ("summary totals", lambda: db.expense_totals(userid)),
+        ("summary totals (rebuilt)", lambda: db.rebuild_totals(userid)),
+        ("pie categories", lambda: db.category_totals(userid)),
+        ("trend (month)", lambda: db.balance_trend(userid, *MONTH, trend_bucket(*MONTH, PLOT_WIDTH))),
+        ("trend (year)", lambda: db.balance_trend(userid, *YEAR, trend_bucket(*YEAR, PLOT_WIDTH))),
+        ("trend (all time, monthly)", lambda: db.balance_trend(userid, bucket="month")),
+        ("trend (all time, raw)", lambda: db.balance_trend(userid)),
+        ("dashboard snapshot", lambda: db.dashboard_snapshot(
+            userid, PAGE_SIZE, trend_window=YEAR, trend_bucket=trend_bucket(*YEAR, PLOT_WIDTH))),
+        ("search (common word)", lambda: db.search(userid, "salary")),
+        ("search (prefix)", lambda: db.search(userid, "gro")),
+        ("search (two words)", lambda: db.search(userid, "coffee card")),
+        ("search (no match)", lambda: db.search(userid, "zzzzqx")),
+        ("export (all time)", lambda: _export(db, userid)),
+    ]
+
+
+def _size(result):
+    if isinstance(result, int):
+        return result
+    try:
+        return len(result)
+    except TypeError:
+        return 1
+
+
+def time_scenario(run, repeat=5, warmup=1):
+    """Wall-clock timings of run() in milliseconds, after warmup untimed calls."""
+    for _ in range(warmup):
+        run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+        "min_ms": round(times[0], 3),
+        "runs": repeat,
+        "rows": _size(result),
+    }
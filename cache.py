@@ -0,0 +1,110 @@
+"""In-process cache for query results.
+
+Results are keyed by (userid, data version, query name, params). Every
+write bumps the user's data version, so an entry can never be served after
+the data behind it changed: entries of an older version are simply never
+looked up again and age out of the LRU. The cache is bounded by an
+estimated memory budget rather than an entry count, since one balance
+trend can be thousands of times larger than one totals row.
+
+Cached results are shared between callers and must be treated as
+read-only.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+CACHE_BUDGET = 32 * 1024 * 1024
+
+# Results larger than this share of the budget are not worth evicting everything else for
+_MAX_ENTRY_SHARE = 4
+
+
+# Long row lists are sized from this many rows rather than walked in full
+_SIZE_SAMPLE = 64
+
+
+def estimate_size(value):
+    """Approximate memory footprint of a query result in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)) and value:
+        sample = value[:_SIZE_SAMPLE]
+        size += sum(estimate_size(item) for item in sample) * len(value) // len(sample)
+    return size
+
+
+class QueryCache:
+    """Thread-safe LRU of query results with a memory budget and per-user versions."""
+
+    def __init__(self, budget=CACHE_BUDGET):
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._versions = {}
+        self._epoch = 0  # bumped by bump(None), covers users with no version yet
+        self._lock = threading.Lock()
+
+    def version(self, userid):
+        """Opaque data version of userid; it changes on every write."""
+        with self._lock:
+            return self._epoch, self._versions.get(userid, 0)
+
+    def bump(self, userid=None):
+        """Invalidate everything cached for userid (everyone when None)."""
+        with self._lock:
+            if userid is None:
+                self._epoch += 1
+                self._entries.clear()
+                self.size = 0
+            else:
+                self._versions[userid] = self._versions.get(userid, 0) + 1
+                for key in [key for key in self._entries if key[0] == userid]:
+                    self.size -= self._entries.pop(key)[1]
+
+    def get_or_compute(self, userid, name, params, compute):
+        """Cached result of compute() for this query, running it on a miss.
+
+        The version is read before compute() runs: if a write lands while
+        the query is in flight, its result is filed under the old version and
+        never served.
+        """
+        with self._lock:
+            key = (userid, (self._epoch, self._versions.get(userid, 0)), name, params)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value = compute()
+        self._store(key, value)
+        return value
+
+    def _store(self, key, value):
+        size = estimate_size(value)
+        if size * _MAX_ENTRY_SHARE > self.budget:
+            return
+        with self._lock:
+            if key[1] != (self._epoch, self._versions.get(key[0], 0)):
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.budget:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,403 @@
+"""Charts for the Graph tab.
+
+ChartManager builds the expense pie and the balance trend once per session
+and updates them in place when the data changes: wedge angles, line data
+and legend rows are reused and the canvas is redrawn with draw_idle().
+Tooltips hit-test against small indexes (an angle table for the pie, the
+points' screen positions sorted by x for the trend) that are rebuilt only
+when the data, the axis limits or the canvas size change, so a mouse move
+is a bisect rather than a pass over every wedge or point.
+Figures are plain matplotlib Figures rather than pyplot figures, so nothing
+accumulates in pyplot's figure registry, and close() releases them on logout.
+"""
+import bisect
+import itertools
+import math
+import tkinter as tk
+
+import customtkinter as ctk
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
+from matplotlib.figure import Figure
+from matplotlib.patches import Shadow
+
+from downsample import lttb
+from periods import PERIODS, RANGE_HINT
+
+PIE_COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57',
+              '#A569BD', '#F39C12', '#E74C3C', '#3498DB', '#2ECC71']
+
+PIE_START_ANGLE = 90
+PIE_EXPLODE = 0.05
+
+TREND_PERIODS = PERIODS
+
+HOVER_RADIUS = 20  # pixels
+
+TREND_MARKER_LIMIT = 150  # above this many points the line is drawn without markers
+TREND_VIEW_DELAY_MS = 250  # wait for zoom/pan to settle before re-fetching
+
+
+class ChartManager:
+    """Owns the pie chart, its legend and the balance trend for one dashboard."""
+
+    def __init__(self, master, on_trend_period, dark_color, darker_color,
+                 primary_color, secondary_color, error_color="#E74C3C", on_trend_view=None):
+        self.master = master
+        self.on_trend_view = on_trend_view
+        self.dark_color = dark_color
+        self.labels = []
+        self.sizes = []
+        self.colors = []
+        self.wedges = []
+        self.pie_texts = []  # the (empty) label Texts Axes.pie adds even with labels=None
+        self.shadows = []
+        self.dates = []
+        self.balances = []
+        self._legend_rows = []
+        self._pie_ends = []       # cumulative wedge end angles, degrees from PIE_START_ANGLE
+        self._line_x = np.empty(0)
+        self._line_y = np.empty(0)
+        self._line_index = None   # (screen x sorted, screen y, point order); None when stale
+        self._home_xlim = None    # x limits of the full-period view
+        self._overview = ([], [])  # full-period data, restored when the toolbar goes home
+        self._showing_detail = False
+        self._view_job = None
+
+        # --- PIE CHART: Expense Distribution ---
+        self.pie_container = ctk.CTkFrame(master, fg_color="transparent")
+        self.pie_container.pack(fill="both", expand=True)
+
+        # Main horizontal frame for split layout
+        self.split_frame = ctk.CTkFrame(self.pie_container, fg_color=darker_color)
+
+        # Left frame: Pie chart (70%)
+        left_frame = ctk.CTkFrame(self.split_frame, fg_color=dark_color, width=900, height=400)
+        left_frame.pack(side="left", fill="both", expand=True)
+        left_frame.pack_propagate(False)
+
+        # Right frame: Legend (30%)
+        right_frame = ctk.CTkFrame(self.split_frame, fg_color=dark_color, width=300)
+        right_frame.pack(side="right", fill="y")
+        right_frame.pack_propagate(False)
+
+        pie_title = ctk.CTkLabel(left_frame, text="📊 Expense Distribution", font=("Arial", 16, "bold"), text_color="white")
+        pie_title.pack(pady=(10, 10))
+
+        # Pie chart (no legend inside chart)
+        self.pie_fig = Figure(figsize=(12, 10), facecolor=dark_color)
+        self.pie_ax = self.pie_fig.add_subplot()
+        self.pie_ax.set_facecolor(dark_color)
+        self.pie_canvas = FigureCanvasTkAgg(self.pie_fig, master=left_frame)
+        self.pie_canvas.get_tk_widget().pack(expand=True, fill="both", padx=10, pady=10)
+
+        self.pie_tooltip = tk.Label(left_frame, bg="#222", fg="white", font=("Arial", 11), bd=1, relief="solid")
+        self.pie_canvas.mpl_connect("motion_notify_event", self._on_pie_motion)
+
+        # Legend on right frame (all visible, scrollable if needed)
+        legend_title = ctk.CTkLabel(right_frame, text="🗂️ Expense Categories", font=("Arial", 14, "bold"), text_color="white")
+        legend_title.pack(pady=(20, 10))
+        self.legend_scroll = ctk.CTkScrollableFrame(right_frame, fg_color=dark_color, width=300, height=300)
+        self.legend_scroll.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.pie_empty_label = ctk.CTkLabel(self.pie_container, text="No expense data available\nAdd some expenses to see the chart",
+                                            font=("Arial", 16), text_color="white")
+
+        # --- BALANCE TREND SORT CONTROLS ---
+        sort_frame = ctk.CTkFrame(master, fg_color="transparent")
+        sort_frame.pack(fill="x", padx=20, pady=(0, 0))
+
+        ctk.CTkLabel(sort_frame, text="Sort Balance Trend by:", font=("Arial", 12, "bold"), text_color="white").pack(side="left", padx=(0, 10))
+
+        self.trend_dropdown = ctk.CTkComboBox(sort_frame, values=TREND_PERIODS, width=190)
+        self.trend_dropdown.set("Month")
+        self.trend_dropdown.pack(side="left", padx=2)
+        ctk.CTkLabel(sort_frame, text=RANGE_HINT, font=("Arial", 11), text_color="gray").pack(side="left", padx=(6, 0))
+
+        sort_btn = ctk.CTkButton(sort_frame, text="Sort", command=lambda: on_trend_period(self.trend_period),
+                                 width=80, fg_color=primary_color, hover_color=secondary_color)
+        sort_btn.pack(side="left", padx=10)
+
+        # --- Balance trend chart ---
+        trend_frame = ctk.CTkFrame(master, fg_color=dark_color)
+        trend_frame.pack(fill="x", padx=20, pady=(0, 10))
+
+        balance_header = ctk.CTkLabel(trend_frame, text="📈 Balance Trend", font=("Arial", 18, "bold"), text_color="white")
+        balance_header.pack(pady=(10, 0), fill="x")
+
+        self.trend_body = ctk.CTkFrame(trend_frame, fg_color="transparent")
+        self.trend_body.pack(fill="both", expand=True)
+
+        self.trend_fig = Figure(figsize=(7, 3), facecolor=dark_color)
+        self.trend_ax = ax = self.trend_fig.add_subplot()
+        ax.set_facecolor(dark_color)
+        self.trend_line, = ax.plot(
+            [], [],
+            marker='o',
+            markersize=8,
+            markerfacecolor=primary_color,
+            markeredgecolor='white',
+            color=primary_color,
+            linewidth=2,
+            label='Balance'
+        )
+        ax.axhline(0, color=error_color, linestyle='--', linewidth=2, label='Limit (₱0)')
+        ax.set_ylabel("Balance (₱)", color='white')
+        ax.set_xlabel("Date", color='white')
+        ax.tick_params(axis='x', labelrotation=45, colors='white')
+        ax.tick_params(axis='y', colors='white')
+        ax.legend(facecolor=dark_color, edgecolor='white', fontsize=10)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+        ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+
+        self.trend_canvas = FigureCanvasTkAgg(self.trend_fig, master=self.trend_body)
+        self.trend_canvas.get_tk_widget().pack(expand=True, fill="both", padx=10, pady=10)
+
+        # Interactive toolbar below the line graph
+        self.toolbar = NavigationToolbar2Tk(self.trend_canvas, self.trend_body, pack_toolbar=False)
+        self.toolbar.update()
+        self.toolbar.pack(fill="x", padx=10, pady=(0, 10))
+
+        self.trend_tooltip = tk.Label(self.trend_body, bg="#222", fg="white", font=("Arial", 11), bd=1, relief="solid")
+        self.trend_canvas.mpl_connect("motion_notify_event", self._on_line_motion)
+        # Anything that moves the points on screen invalidates the hover index
+        ax.callbacks.connect("xlim_changed", self._on_trend_xlim)
+        ax.callbacks.connect("ylim_changed", self._invalidate_line_index)
+        self.trend_canvas.mpl_connect("resize_event", self._invalidate_line_index)
+        self.trend_canvas.mpl_connect("draw_event", self._invalidate_line_index)
+
+        self.trend_empty_label = ctk.CTkLabel(trend_frame, text="No balance trend data available.",
+                                              font=("Arial", 12), text_color="white")
+
+        self.error_label = ctk.CTkLabel(master, text="", font=("Arial", 16), text_color=error_color)
+
+    @property
+    def trend_period(self):
+        return self.trend_dropdown.get()
+
+    def show_error(self, message):
+        self.error_label.configure(text=message)
+        self.error_label.pack(expand=True)
+
+    # --- Pie ---
+    def update_pie(self, categories):
+        """Show [(expense_type, total)] in the pie and legend."""
+        self.error_label.pack_forget()
+        self.labels = [category for category, _ in categories]
+        self.sizes = [float(amount) for _, amount in categories]
+        self.colors = list(itertools.islice(itertools.cycle(PIE_COLORS), len(self.labels)))
+
+        if not self.labels or sum(self.sizes) <= 0:
+            self.split_frame.pack_forget()
+            self.pie_empty_label.pack(expand=True)
+            return
+        self.pie_empty_label.pack_forget()
+        self.split_frame.pack(fill="both", expand=True, padx=20, pady=20)
+
+        if len(self.wedges) == len(self.sizes):
+            self._move_wedges()
+        else:
+            for artist in self.wedges + self.pie_texts + self.shadows:
+                artist.remove()
+            self.wedges, self.pie_texts = self.pie_ax.pie(
+                self.sizes,
+                labels=None,
+                colors=self.colors,
+                autopct=None,
+                startangle=PIE_START_ANGLE,
+                explode=[PIE_EXPLODE] * len(self.sizes),
+                wedgeprops={'linewidth': 2, 'edgecolor': 'white'}
+            )
+            self._add_shadows()
+            self.pie_fig.tight_layout()
+        self._pie_ends = list(itertools.accumulate(size / sum(self.sizes) * 360 for size in self.sizes))
+        self._update_legend()
+        self.pie_canvas.draw_idle()
+
+    def _move_wedges(self):
+        """Re-angle the existing wedges the way Axes.pie would lay them out."""
+        total = sum(self.sizes)
+        theta1 = PIE_START_ANGLE / 360
+        for wedge, size, color in zip(self.wedges, self.sizes, self.colors):
+            theta2 = theta1 + size / total
+            mid = math.pi * (theta1 + theta2)
+            wedge.set_center((PIE_EXPLODE * math.cos(mid), PIE_EXPLODE * math.sin(mid)))
+            wedge.set_theta1(theta1 * 360)
+            wedge.set_theta2(theta2 * 360)
+            wedge.set_facecolor(color)
+            theta1 = theta2
+        for shadow in self.shadows:
+            shadow.remove()
+        self._add_shadows()
+
+    def _add_shadows(self):
+        # Shadows copy the wedge outline when created, so they follow the wedges by being rebuilt
+        self.shadows = []
+        for wedge in self.wedges:
+            shadow = Shadow(wedge, -0.02, -0.02, label='_nolegend_')
+            self.pie_ax.add_patch(shadow)
+            self.shadows.append(shadow)
+
+    def _update_legend(self):
+        for i, (label, size) in enumerate(zip(self.labels, self.sizes)):
+            if i == len(self._legend_rows):
+                row = ctk.CTkFrame(self.legend_scroll, fg_color="transparent")
+                color_box = ctk.CTkLabel(row, text="", width=20, height=20)
+                color_box.pack(side="left", padx=(0, 8))
+                legend_label = ctk.CTkLabel(row, text="", font=("Arial", 12), text_color="white", anchor="w")
+                legend_label.pack(side="left", fill="x", expand=True)
+                self._legend_rows.append((row, color_box, legend_label))
+            row, color_box, legend_label = self._legend_rows[i]
+            color_box.configure(fg_color=self.colors[i])
+            legend_label.configure(text=f"{label}: ₱{size:,.0f}")
+            row.pack(fill="x", pady=4)
+        for row, _, _ in self._legend_rows[len(self.labels):]:
+            row.pack_forget()
+
+    def _wedge_at(self, x, y):
+        """Index of the wedge under screen point (x, y), or None."""
+        if not self._pie_ends or not self.wedges:
+            return None
+        px, py = self.pie_ax.transData.inverted().transform((x, y))
+        angle = (math.degrees(math.atan2(py, px)) - PIE_START_ANGLE) % 360
+        i = min(bisect.bisect_right(self._pie_ends, angle), len(self._pie_ends) - 1)
+        # Exploded wedges are offset from the origin, so confirm against the
+        # candidate's own centre; a neighbour can own points near the seam.
+        for j in (i, (i - 1) % len(self.wedges), (i + 1) % len(self.wedges)):
+            wedge = self.wedges[j]
+            cx, cy = wedge.center
+            if math.hypot(px - cx, py - cy) > wedge.r:
+                continue
+            offset = (math.degrees(math.atan2(py - cy, px - cx)) - wedge.theta1) % 360
+            if offset <= wedge.theta2 - wedge.theta1:
+                return j
+        return None
+
+    def _on_pie_motion(self, event):
+        i = self._wedge_at(event.x, event.y)
+        if i is None:
+            self.pie_tooltip.place_forget()
+            return
+        self.pie_tooltip.config(text=f"{self.labels[i]}: ₱{self.sizes[i]:,.2f}")
+        self.pie_tooltip.place(x=event.x + 10, y=event.y + 10)
+
+    # --- Balance trend ---
+    @property
+    def plot_width(self):
+        """Width of the trend axes in pixels: the most points worth plotting."""
+        return max(int(self.trend_ax.bbox.width), 1)
+
+    def update_trend(self, dates, balances):
+        """Plot running balances against their datetimes and reset the view to fit them."""
+        self.error_label.pack_forget()
+        self._overview = (list(dates), list(balances))
+        self._showing_detail = False
+        if not self._overview[0]:
+            self.dates, self.balances = [], []
+            self.trend_body.pack_forget()
+            self.trend_empty_label.pack(pady=30)
+            return
+        self.trend_empty_label.pack_forget()
+        self.trend_body.pack(fill="both", expand=True)
+
+        self._plot_trend(*self._overview)
+        self.trend_ax.relim()
+        self.trend_ax.autoscale_view()
+        self._home_xlim = self.trend_ax.get_xlim()
+        # New data invalidates the toolbar's zoom/pan history
+        self.toolbar.update()
+        self.trend_fig.autofmt_xdate()
+        self.trend_fig.tight_layout()
+        self.trend_canvas.draw_idle()
+
+    def show_trend_detail(self, dates, balances):
+        """Plot finer data fetched for the zoomed view, keeping the current limits."""
+        if self._at_home() or not dates:
+            return
+        self._showing_detail = True
+        self._plot_trend(dates, balances)
+        self.trend_canvas.draw_idle()
+
+    def _plot_trend(self, dates, balances):
+        x = np.asarray(mdates.date2num(dates), dtype=float)
+        y = np.asarray(balances, dtype=float)
+        keep = lttb(x, y, self.plot_width)
+        self.dates = [dates[i] for i in keep]
+        self.balances = [balances[i] for i in keep]
+        self._line_x, self._line_y = x[keep], y[keep]
+        self._line_index = None
+        self.trend_line.set_data(self._line_x, self._line_y)
+        self.trend_line.set_marker('o' if len(keep) <= TREND_MARKER_LIMIT else '')
+
+    def _at_home(self):
+        return self._home_xlim is None or np.allclose(self.trend_ax.get_xlim(), self._home_xlim)
+
+    def _on_trend_xlim(self, ax):
+        self._invalidate_line_index()
+        if self._view_job is not None:
+            self.master.after_cancel(self._view_job)
+        self._view_job = self.master.after(TREND_VIEW_DELAY_MS, self._trend_view_settled)
+
+    def _trend_view_settled(self):
+        self._view_job = None
+        if self._at_home():
+            if self._showing_detail:
+                self._showing_detail = False
+                self._plot_trend(*self._overview)
+                self.trend_canvas.draw_idle()
+            return
+        if self.on_trend_view is None:
+            return
+        # Fetch half a view either side so short pans stay covered
+        x0, x1 = self.trend_ax.get_xlim()
+        pad = (x1 - x0) / 2
+        start, end = (mdates.num2date(value).replace(tzinfo=None) for value in (x0 - pad, x1 + pad))
+        self.on_trend_view(start, end, self.plot_width * 2)
+
+    def _invalidate_line_index(self, *args):
+        self._line_index = None
+
+    def _point_at(self, x, y):
+        """Index of the trend point within HOVER_RADIUS of screen point (x, y), or None."""
+        if not len(self._line_x):
+            return None
+        if self._line_index is None:
+            screen = self.trend_ax.transData.transform(np.column_stack((self._line_x, self._line_y)))
+            order = np.argsort(screen[:, 0], kind="stable")
+            self._line_index = (screen[order, 0], screen[order, 1], order)
+        sx, sy, order = self._line_index
+        lo = np.searchsorted(sx, x - HOVER_RADIUS, side="left")
+        hi = np.searchsorted(sx, x + HOVER_RADIUS, side="right")
+        if lo == hi:
+            return None
+        dist = np.hypot(sx[lo:hi] - x, sy[lo:hi] - y)
+        nearest = int(np.argmin(dist))
+        return int(order[lo + nearest]) if dist[nearest] < HOVER_RADIUS else None
+
+    def _on_line_motion(self, event):
+        i = self._point_at(event.x, event.y) if event.inaxes == self.trend_ax else None
+        if i is None:
+            self.trend_tooltip.place_forget()
+            return
+        self.trend_tooltip.config(text=f"{self.dates[i].strftime('%Y-%m-%d %H:%M:%S')}: ₱{self.balances[i]:,.2f}")
+        self.trend_tooltip.place(x=event.x + 10, y=event.y + 10)
+
+    def close(self):
+        """Release both figures; call when the dashboard is torn down."""
+        if self._view_job is not None:
+            self.master.after_cancel(self._view_job)
+            self._view_job = None
+        for canvas, fig in ((self.pie_canvas, self.pie_fig), (self.trend_canvas, self.trend_fig)):
+            fig.clear()
+            try:
+                canvas.get_tk_widget().destroy()
+            except tk.TclError:
+                pass
+        self.wedges = []
+        self.pie_texts = []
+        self.shadows = []
+        self._pie_ends = []
+        self._line_index = None
+
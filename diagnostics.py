@@ -0,0 +1,281 @@
+"""Runtime diagnostics: query timings, a slow-query log, Tk event-loop lag and render times.
+
+A Diagnostics object collects everything; the app keeps one per process.
+Queries are timed at the connection pool, the one place every cursor comes
+from: attach() makes the pool hand out TracedCursors, which record each
+statement's duration (execute plus fetches), row count and call site. The
+heartbeat re-arms itself with app.after and records how late each tick
+fires, which is how long the Tk loop was blocked. Render times are recorded
+with `with diagnostics.timed("table"): ...`; matplotlib canvases only draw
+later, from draw_idle(), so time_canvas() records their real draws.
+
+report() returns all of it as a JSON-ready dict and dump() writes it to a
+file; the app shows it in a hidden panel (Ctrl+Shift+D).
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# Statements slower than this go to the slow-query log
+SLOW_QUERY_MS = float(os.environ.get("XPENSE_SLOW_QUERY_MS", 100))
+
+# Recent entries kept per log
+HISTORY = 500
+
+HEARTBEAT_MS = 100
+
+# Frames in these files are plumbing; the call site is the first frame outside them
+_INTERNAL_FILES = ("diagnostics.py", "pool.py", "storage.py", "cache.py", "contextlib.py")
+
+
+def _call_site():
+    """(backend method, caller "file:line function") of the query being run.
+
+    The method is the outermost public storage.py function on the stack,
+    e.g. dashboard_snapshot rather than the _rows() it ends up in.
+    """
+    frame = sys._getframe(2)
+    method = inner = None
+    while frame is not None:
+        filename = os.path.basename(frame.f_code.co_filename)
+        if filename not in _INTERNAL_FILES:
+            return method or inner, f"{filename}:{frame.f_lineno} {frame.f_code.co_name}"
+        if filename == "storage.py":
+            name = frame.f_code.co_name
+            inner = inner or name
+            if not name.startswith(("_", "<")):
+                method = name
+        frame = frame.f_back
+    return method or inner, None
+
+
+def _statement(sql):
+    return " ".join(sql.split())
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "median_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+class TracedCursor:
+    """DB-API cursor wrapper that reports every statement to a Diagnostics object.
+
+    A statement's time runs from execute() through the fetches that follow
+    it, and is recorded when the next statement starts or the cursor closes.
+    """
+
+    def __init__(self, cursor, diagnostics):
+        self._cursor = cursor
+        self._diagnostics = diagnostics
+        self._current = None  # [sql, elapsed ms, rows, method, caller]
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _finish(self):
+        if self._current is not None:
+            self._diagnostics.record_query(*self._current)
+            self._current = None
+
+    def _run(self, call, sql, *args):
+        self._finish()
+        method, caller = _call_site()
+        start = time.perf_counter()
+        try:
+            return call(sql, *args)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            rows = max(self._cursor.rowcount, 0) if self._cursor.rowcount is not None else 0
+            self._current = [sql, elapsed, rows, method, caller]
+
+    def execute(self, sql, params=()):
+        return self._run(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq):
+        return self._run(self._cursor.executemany, sql, seq)
+
+    def _fetch(self, call, *args):
+        start = time.perf_counter()
+        result = call(*args)
+        if self._current is not None:
+            self._current[1] += (time.perf_counter() - start) * 1000
+            self._current[2] += len(result) if isinstance(result, list) else int(result is not None)
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(self._cursor.fetchmany, *(() if size is None else (size,)))
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+
+class Diagnostics:
+    """Thread-safe store for query timings, event-loop lag and render times."""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, history=HISTORY):
+        self.slow_ms = slow_ms
+        self.started = datetime.now()
+        self._lock = threading.Lock()
+        self._queries = deque(maxlen=history)
+        self._slow = deque(maxlen=history)
+        self._statements = {}  # statement -> [count, total ms, max ms, rows, method]
+        self._lag = deque(maxlen=history)
+        self._renders = {}  # name -> deque of ms
+        self._history = history
+        self._heartbeat = None
+
+    # --- Queries ---
+    def attach(self, backend):
+        """Time every statement the backend's connection pool runs from now on."""
+        backend.pool.trace = lambda cursor: TracedCursor(cursor, self)
+        return backend
+
+    def record_query(self, sql, elapsed_ms, rows, method=None, caller=None):
+        statement = _statement(sql)
+        entry = {
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            "ms": round(elapsed_ms, 3),
+            "rows": rows,
+            "method": method,
+            "caller": caller,
+            "thread": threading.current_thread().name,
+            "sql": statement,
+        }
+        with self._lock:
+            self._queries.append(entry)
+            if elapsed_ms >= self.slow_ms:
+                self._slow.append(entry)
+            stats = self._statements.get(statement)
+            if stats is None:
+                stats = self._statements[statement] = [0, 0.0, 0.0, 0, method]
+            stats[0] += 1
+            stats[1] += elapsed_ms
+            stats[2] = max(stats[2], elapsed_ms)
+            stats[3] += rows
+
+    # --- Tk event loop ---
+    def start_heartbeat(self, root, interval_ms=HEARTBEAT_MS):
+        """Sample how late root.after callbacks run; the lag is time the loop was blocked."""
+        self.stop_heartbeat()
+        state = {"expected": time.perf_counter() + interval_ms / 1000, "job": None}
+
+        def tick():
+            now = time.perf_counter()
+            with self._lock:
+                self._lag.append(max(0.0, (now - state["expected"]) * 1000))
+            state["expected"] = now + interval_ms / 1000
+            state["job"] = root.after(interval_ms, tick)
+
+        state["job"] = root.after(interval_ms, tick)
+        self._heartbeat = (root, state)
+
+    def stop_heartbeat(self):
+        if self._heartbeat is not None:
+            root, state = self._heartbeat
+            try:
+                root.after_cancel(state["job"])
+            except Exception:
+                pass
+            self._heartbeat = None
+
+    # --- Rendering ---
+    @contextmanager
+    def timed(self, name):
+        """Record how long the block takes under name (e.g. "table", "pie")."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._renders.setdefault(name, deque(maxlen=self._history)).append(elapsed)
+
+    def time_canvas(self, canvas, name):
+        """Record every actual draw of a matplotlib canvas under name.
+
+        draw_idle() only schedules a draw; the rendering (and the copy to
+        the Tk widget) happens when the canvas's draw() runs, so that is
+        what is timed.
+        """
+        draw = canvas.draw
+
+        def timed_draw(*args, **kwargs):
+            with self.timed(name):
+                return draw(*args, **kwargs)
+        canvas.draw = timed_draw
+
+    # --- Reports ---
+    def report(self, top=20):
+        """Everything collected, as a JSON-ready dict."""
+        with self._lock:
+            statements = sorted(self._statements.items(), key=lambda item: item[1][1], reverse=True)
+            report = {
+                "started": self.started.isoformat(timespec="seconds"),
+                "generated": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "slow_query_ms": self.slow_ms,
+                "queries": {
+                    "recorded": sum(stats[0] for _, stats in statements),
+                    "by_total_time": [
+                        {"sql": sql, "method": method, "count": count, "total_ms": round(total, 2),
+                         "mean_ms": round(total / count, 3), "max_ms": round(worst, 2), "rows": rows}
+                        for sql, (count, total, worst, rows, method) in statements[:top]
+                    ],
+                    "recent": list(self._queries),
+                },
+                "slow_queries": list(self._slow),
+                "event_loop_lag": _percentiles(self._lag),
+                "renders": {name: _percentiles(times) for name, times in sorted(self._renders.items())},
+            }
+        return report
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(top=len(self._statements)), f, indent=2)
+
+    def summary(self, top=8):
+        """Short plain-text version of report() for the diagnostics panel."""
+        report = self.report(top)
+        lines = [f"Queries recorded: {report['queries']['recorded']:,}   "
+                 f"slow (>= {self.slow_ms:g} ms): {len(report['slow_queries'])}"]
+        lag = report["event_loop_lag"]
+        if lag:
+            lines.append(f"Tk loop lag: median {lag['median_ms']} ms, p95 {lag['p95_ms']} ms, max {lag['max_ms']} ms")
+        lines.append("")
+        lines.append("Render times (median / p95 / max ms):")
+        for name, stats in report["renders"].items():
+            lines.append(f"  {name:<14} {stats['median_ms']:>8} {stats['p95_ms']:>8} {stats['max_ms']:>8}"
+                         f"   x{stats['count']}")
+        lines.append("")
+        lines.append("Top statements by total time (count, total ms, max ms):")
+        for stats in report["queries"]["by_total_time"]:
+            lines.append(f"  {stats['count']:>6} {stats['total_ms']:>10} {stats['max_ms']:>9}  "
+                         f"{stats['method'] or '?'}: {stats['sql'][:90]}")
+        lines.append("")
+        lines.append("Slow queries (latest first):")
+        for entry in reversed(report["slow_queries"][-top:]):
+            lines.append(f"  {entry['at'][11:]} {entry['ms']:>9} ms {entry['rows']:>7} rows  "
+                         f"{entry['method'] or '?'} <- {entry['caller']}")
+        return "\n".join(lines)
@@ -0,0 +1,70 @@
+"""Streaming CSV export.
+
+Rows are read from the backend in fetchmany() chunks and written to the
+file as they arrive, so exporting a long history needs memory for one
+chunk only. The file is written under a temporary name and moved into
+place when complete; a cancelled or failed export leaves nothing behind.
+"""
+import csv
+import os
+from datetime import datetime
+from decimal import Decimal
+
+from storage import EXPENSE_COLUMNS
+
+EXPORT_CHUNK = 5000
+
+
+class ExportCancelled(Exception):
+    """Raised when the cancel event is set during an export."""
+
+
+_DATE = EXPENSE_COLUMNS.index("date")
+_AMOUNT = EXPENSE_COLUMNS.index("amount")
+
+
+def _csv_row(row):
+    # csv writes None as "" already; only the typed columns need formatting
+    row = list(row)
+    date, amount = row[_DATE], row[_AMOUNT]
+    if isinstance(date, datetime):
+        row[_DATE] = date.isoformat(" ", "seconds")
+    if isinstance(amount, Decimal):
+        row[_AMOUNT] = format(amount, "f")
+    return row
+
+
+def export_csv(backend, userid, path, start=None, end=None, progress=None, cancel=None,
+               chunk_size=EXPORT_CHUNK):
+    """Write the user's records dated in [start, end) to path; returns the row count.
+
+    progress(done, total) is called after every chunk and cancel is an
+    optional threading.Event checked between chunks. Both are called on the
+    exporting thread.
+    """
+    total = backend.count_in_period(userid, start, end)
+    done = 0
+    partial = f"{path}.part"
+    rows = backend.iter_expenses(userid, start, end, chunk_size)
+    try:
+        with open(partial, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPENSE_COLUMNS)
+            if progress is not None:
+                progress(done, total)
+            for chunk in rows:
+                if cancel is not None and cancel.is_set():
+                    raise ExportCancelled(path)
+                writer.writerows(map(_csv_row, chunk))
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, max(total, done))
+        os.replace(partial, path)
+    except BaseException:
+        rows.close()
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        raise
+    return done
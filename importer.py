@@ -0,0 +1,230 @@
+"""Bulk CSV import for exported ledgers and bank statements.
+
+The file is read in chunks. Each row is validated and its category mapped
+onto CATEGORIES. A row is skipped as a duplicate while the ledger still
+has an unmatched record with the same (date, amount, title): the keys of
+the user's existing records are counted up front, and each skipped row
+uses up one of them. Re-importing a file therefore adds nothing, while two
+identical rows within one file (two same-day bus fares on a statement
+without times) are both kept. The surviving rows go to
+backend.insert_expenses(), which inserts them with executemany() in one
+transaction, so a failed or cancelled import changes nothing.
+
+Columns are found by header name, so both Xpense's own CSV export and
+typical bank statements work:
+
+- date: date, posted, transaction date, booking date
+- title: title, description, payee, name, details, memo
+- amount: amount or value; or separate debit / credit (withdrawal / deposit)
+- category: expense_type, category
+- comment: comment, notes, note, reference
+
+Without a category column the sign decides: money in is Income, money
+out is Other.
+"""
+import csv
+import re
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from storage import CATEGORIES, INCOME_TYPES
+
+IMPORT_CHUNK = 5000
+
+# Rejected rows kept for the report (the count is always exact)
+MAX_REPORTED_ERRORS = 100
+
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%Y/%m/%d",
+                "%d/%m/%Y", "%m/%d/%Y", "%d.%m.%Y", "%d-%m-%Y")
+
+_HEADERS = {
+    "date": ("date", "posted", "transaction date", "booking date", "posting date"),
+    "title": ("title", "description", "payee", "name", "details", "memo"),
+    "amount": ("amount", "value"),
+    "debit": ("debit", "withdrawal", "money out", "paid out"),
+    "credit": ("credit", "deposit", "money in", "paid in"),
+    "category": ("expense_type", "category"),
+    "comment": ("comment", "notes", "note", "reference"),
+}
+
+# Common bank and budgeting labels for the app's categories (lower case)
+CATEGORY_ALIASES = {
+    "salary": "Income", "wages": "Income", "payroll": "Income", "interest": "Income", "refund": "Income",
+    "groceries": "Supermarket", "grocery": "Supermarket",
+    "food": "Foods", "dining": "Restaurants", "restaurant": "Restaurants",
+    "coffee": "Cafes", "cafe": "Cafes", "fastfood": "Fast Food",
+    "bars": "Drinks", "alcohol": "Drinks",
+    "travel": "Transport", "fuel": "Transport", "gas": "Transport", "taxi": "Transport", "transit": "Transport",
+    "rent": "Housing and utilities", "mortgage": "Housing and utilities", "utilities": "Housing and utilities",
+    "bills": "Housing and utilities",
+    "transfer": "Transfers to other people", "transfers": "Transfers to other people",
+    "subscriptions": "Online services", "subscription": "Online services", "streaming": "Online services",
+    "clothing": "Shopping", "retail": "Shopping",
+}
+
+_CATEGORY_LOOKUP = {category.lower(): category for category in CATEGORIES}
+_CATEGORY_LOOKUP.update(CATEGORY_ALIASES)
+
+_NOT_AMOUNT = re.compile(r"[^\d.\-]")
+
+
+class ImportCancelled(Exception):
+    """Raised when the cancel event is set during an import."""
+
+
+class ImportResult:
+    """Counts and problems from one import."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.errors = []  # (line number, message), first MAX_REPORTED_ERRORS only
+        self.unmapped = {}  # category label in the file -> rows filed under Other
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def summary(self):
+        text = f"{self.inserted:,} imported, {self.duplicates:,} duplicates skipped, {self.rejected:,} rejected"
+        if self.unmapped:
+            text += f"; filed under Other: {', '.join(sorted(self.unmapped))}"
+        return text
+
+
+def parse_amount(text):
+    """Decimal from "1,234.50", "₱-20", "(15.00)" and the like; None when empty."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    negative = text.startswith("(") and text.endswith(")")
+    value = Decimal(_NOT_AMOUNT.sub("", text.replace(",", "")))
+    return -value if negative else value
+
+
+def parse_date(text, date_format=None):
+    text = (text or "").strip()
+    if not text:
+        raise ValueError("missing date")
+    if date_format:
+        return datetime.strptime(text, date_format)
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date {text!r}")
+
+
+def map_category(label, amount, result):
+    """App category for a file's label (or for the sign of amount when there is none)."""
+    label = (label or "").strip()
+    if not label:
+        return INCOME_TYPES[0] if amount > 0 else "Other"
+    category = _CATEGORY_LOOKUP.get(label.lower())
+    if category is None:
+        result.unmapped[label] = result.unmapped.get(label, 0) + 1
+        return "Other"
+    return category
+
+
+def row_key(date, amount, title):
+    """Duplicate-detection key: same second, same cents, same title ignoring case and spacing."""
+    cents = int((Decimal(str(amount)) * 100).to_integral_value())
+    return date.replace(microsecond=0), cents, " ".join((title or "").split()).casefold()
+
+
+def _columns(header):
+    names = [name.strip().lower() for name in header]
+    found = {}
+    for field, aliases in _HEADERS.items():
+        for alias in aliases:
+            if alias in names:
+                found[field] = names.index(alias)
+                break
+    if "date" not in found:
+        raise ValueError("the file has no date column")
+    if "amount" not in found and "debit" not in found and "credit" not in found:
+        raise ValueError("the file has no amount, debit or credit column")
+    return found
+
+
+def _count_lines(path):
+    with open(path, "rb") as f:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+
+
+def _parse_rows(path, result, existing, date_format, progress, cancel, total):
+    """Yield (date, title, expense_type, amount, comment) for every new, valid row."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = _columns(header)
+
+        def cell(row, field):
+            index = columns.get(field)
+            return row[index] if index is not None and index < len(row) else ""
+
+        done = 0
+        for row in reader:
+            done += 1
+            if done % IMPORT_CHUNK == 0:
+                if cancel is not None and cancel.is_set():
+                    raise ImportCancelled(path)
+                if progress is not None:
+                    progress(done, total)
+            if not any(row):
+                continue
+            line = reader.line_num
+            try:
+                date = parse_date(cell(row, "date"), date_format)
+                amount = parse_amount(cell(row, "amount"))
+                if amount is None:
+                    credit = parse_amount(cell(row, "credit")) or 0
+                    debit = parse_amount(cell(row, "debit")) or 0
+                    amount = abs(credit) - abs(debit)
+            except (ValueError, InvalidOperation) as e:
+                result.reject(line, str(e) if isinstance(e, ValueError) else "unreadable amount")
+                continue
+            if amount == 0:
+                result.reject(line, "zero amount")
+                continue
+            title = cell(row, "title").strip() or None
+            expense_type = map_category(cell(row, "category"), amount, result)
+            amount = abs(amount)
+            key = row_key(date, amount, title)
+            if existing[key] > 0:
+                existing[key] -= 1
+                result.duplicates += 1
+                continue
+            yield date, title, expense_type, amount, cell(row, "comment").strip() or None
+        if progress is not None:
+            progress(done, max(total, done))
+
+
+def import_csv(backend, userid, path, date_format=None, progress=None, cancel=None):
+    """Import a CSV file into the user's ledger; returns an ImportResult.
+
+    progress(done, total) is called every IMPORT_CHUNK rows and cancel is
+    an optional threading.Event; both are used on the importing thread.
+    date_format forces one strptime format for ambiguous day/month files.
+    """
+    result = ImportResult()
+    existing = Counter()
+    for rows in backend.iter_expenses(userid):
+        for _, _, date, title, _, amount, _ in rows:
+            if date is not None and amount is not None:
+                existing[row_key(date, amount, title)] += 1
+    total = max(_count_lines(path) - 1, 0)
+    rows = _parse_rows(path, result, existing, date_format, progress, cancel, total)
+    result.inserted = backend.insert_expenses(userid, rows)
+    return result
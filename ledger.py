@@ -0,0 +1,95 @@
+"""Ledger table widget for the Home tab."""
+from tkinter import ttk
+
+import customtkinter as ctk
+
+
+class LedgerGrid(ctk.CTkFrame):
+    """Expense table backed by a ttk.Treeview.
+
+    Tk only draws the rows that are on screen, and set_rows() reuses the
+    existing items instead of destroying and recreating widgets, so changing
+    pages is a handful of item updates. The selected record is a dict lookup.
+    Clicking a column header calls on_sort(column, descending) so the caller
+    can re-query with a matching ORDER BY.
+    """
+
+    def __init__(self, master, columns, on_select=None, on_sort=None,
+                 row_colors=("#414c50", "#2d383c"), heading_color="#0784b5",
+                 select_color="#39ace7", income_color="#2ECC71", expense_color="#E74C3C",
+                 sort_column="id", sort_descending=True, **kwargs):
+        super().__init__(master, **kwargs)
+        self.columns = columns
+        self.on_select = on_select
+        self.on_sort = on_sort
+        self.sort_column = sort_column
+        self.sort_descending = sort_descending
+        self._record_ids = {}
+
+        style = ttk.Style(self)
+        style.theme_use("clam")  # the default themes ignore custom Treeview colors
+        style.configure("Ledger.Treeview", background=row_colors[0], fieldbackground=row_colors[1],
+                        foreground="#FFFFFF", rowheight=28, font=("Arial", 10), borderwidth=0)
+        style.configure("Ledger.Treeview.Heading", background=heading_color, foreground="#FFFFFF",
+                        font=("Arial", 12, "bold"), relief="flat", padding=6)
+        style.map("Ledger.Treeview", background=[("selected", select_color)],
+                  foreground=[("selected", "#FFFFFF")])
+        style.map("Ledger.Treeview.Heading", background=[("active", select_color)])
+
+        self.tree = ttk.Treeview(self, columns=[key for key, _ in columns], show="headings",
+                                 style="Ledger.Treeview", selectmode="browse")
+        for key, heading in columns:
+            self.tree.heading(key, text=heading, command=lambda k=key: self._sort_by(k))
+            self.tree.column(key, anchor="center", width=100, stretch=True)
+        self.tree.tag_configure("even", background=row_colors[0])
+        self.tree.tag_configure("odd", background=row_colors[1])
+        self.tree.tag_configure("income", foreground=income_color)
+        self.tree.tag_configure("expense", foreground=expense_color)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+
+        scrollbar = ctk.CTkScrollbar(self, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self._update_headings()
+
+    def set_rows(self, rows):
+        """Show rows of (record_id, values, kind) where kind is "income" or "expense"."""
+        items = self.tree.get_children()
+        self.tree.selection_set(())
+        self._record_ids = {}
+        for i, (record_id, values, kind) in enumerate(rows):
+            iid = str(i)
+            tags = ("even" if i % 2 == 0 else "odd", kind)
+            if i < len(items):
+                self.tree.item(iid, values=values, tags=tags)
+            else:
+                self.tree.insert("", "end", iid=iid, values=values, tags=tags)
+            self._record_ids[iid] = record_id
+        if len(items) > len(rows):
+            self.tree.delete(*items[len(rows):])
+        self.tree.yview_moveto(0)
+
+    def selected_record(self):
+        selection = self.tree.selection()
+        return self._record_ids.get(selection[0]) if selection else None
+
+    def _on_select(self, event=None):
+        if self.on_select is not None:
+            self.on_select(self.selected_record())
+
+    def _sort_by(self, column):
+        if column == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+        self._update_headings()
+        if self.on_sort is not None:
+            self.on_sort(self.sort_column, self.sort_descending)
+
+    def _update_headings(self):
+        for key, heading in self.columns:
+            if key == self.sort_column:
+                heading = f"{heading} {'▼' if self.sort_descending else '▲'}"
+            self.tree.heading(key, text=heading)
@@ -0,0 +1,192 @@
+"""Maintenance commands for the Xpense database.
+
+    python manage.py migrate
+    python manage.py check-plans [--userid USER]
+    python manage.py reconcile-totals [--userid USER]
+    python manage.py verify-rollups [--userid USER]
+    python manage.py rebuild-rollups [--userid USER]
+    python manage.py snapshot-export USER FILE [--period PERIOD]
+    python manage.py snapshot-restore USER FILE [--replace]
+    python manage.py import USER FILE [--date-format FORMAT]
+    python manage.py startup-report [--budget-ms MS] [--top N]
+
+The backend is chosen the same way as the app (XPENSE_BACKEND, or --backend).
+"""
+import argparse
+import sys
+
+import importer
+import migrations
+import snapshot
+import startup
+from periods import ALL_TIME, period_bounds
+from storage import connect_backend
+
+
+def cmd_migrate(db, args):
+    applied = migrations.apply_migrations(db)
+    version = migrations.current_version(db)
+    if applied:
+        print(f"Applied migrations {', '.join(map(str, applied))}; schema is at version {version}")
+    else:
+        print(f"Schema is up to date (version {version})")
+    return 0
+
+
+def cmd_check_plans(db, args):
+    failures = migrations.check_query_plans(db, args.userid)
+    for name, sql, problems in failures:
+        print(f"FULL SCAN in {name}: {'; '.join(problems)}\n    {sql}")
+    if failures:
+        print(f"{len(failures)} hot queries fall back to a full scan")
+        return 1
+    print(f"All {len(migrations.HOT_QUERIES)} hot queries use an index")
+    return 0
+
+
+def cmd_reconcile_totals(db, args):
+    drift = db.rebuild_totals(args.userid)
+    for userid, stored, actual in drift:
+        print(f"{userid}: stored income/expenses/count {stored} -> rebuilt {actual}")
+    print(f"Rebuilt user_totals; {len(drift)} user(s) had drifted")
+    return 0
+
+
+def _print_rollup_mismatches(mismatches, limit=50):
+    for table, userid, period, category, stored, actual in mismatches[:limit]:
+        print(f"{table} {userid} {period} {category}: stored total/count {stored}, expense has {actual}")
+    if len(mismatches) > limit:
+        print(f"... and {len(mismatches) - limit} more")
+
+
+def cmd_verify_rollups(db, args):
+    mismatches = db.verify_rollups(args.userid)
+    _print_rollup_mismatches(mismatches)
+    if mismatches:
+        print(f"{len(mismatches)} rollup row(s) disagree with expense; run rebuild-rollups")
+        return 1
+    print("Daily and monthly rollups match the expense table")
+    return 0
+
+
+def cmd_rebuild_rollups(db, args):
+    mismatches = db.rebuild_rollups(args.userid)
+    _print_rollup_mismatches(mismatches)
+    print(f"Rebuilt expense_daily and expense_monthly; {len(mismatches)} row(s) had drifted")
+    return 0
+
+
+def cmd_snapshot_export(db, args):
+    try:
+        bounds = period_bounds(args.period)
+    except ValueError as e:
+        print(e)
+        return 1
+    count = snapshot.write_snapshot(db, args.userid, args.file, *bounds)
+    print(f"Wrote {count} records for {args.userid} to {args.file}")
+    return 0
+
+
+def cmd_snapshot_restore(db, args):
+    if not db.user_exists(args.userid):
+        print(f"No such user: {args.userid}")
+        return 1
+    count = snapshot.restore_snapshot(db, args.userid, args.file, replace=args.replace)
+    print(f"Restored {count} records for {args.userid} from {args.file}")
+    return 0
+
+
+def cmd_import(db, args):
+    if not db.user_exists(args.userid):
+        print(f"No such user: {args.userid}")
+        return 1
+    result = importer.import_csv(db, args.userid, args.file, date_format=args.date_format)
+    for line, error in result.errors:
+        print(f"line {line}: {error}")
+    print(f"{args.file}: {result.summary()}")
+    return 0
+
+
+def cmd_startup_report(db, args):
+    try:
+        times = startup.import_times()
+    except RuntimeError as e:
+        print(f"Could not import the login screen's modules: {e}")
+        return 1
+    slowest = sorted(times, key=lambda row: row[1], reverse=True)[:args.top]
+    print(f"{'self ms':>8} {'cum ms':>8}  module")
+    for name, self_us, cumulative_us, _ in slowest:
+        print(f"{self_us / 1000:8.1f} {cumulative_us / 1000:8.1f}  {name}")
+    total_ms = sum(cumulative for _, _, cumulative, depth in times if depth == 0) / 1000
+    print(f"Login screen imports: {len(times)} modules in {total_ms:.0f} ms (budget {args.budget_ms} ms)")
+    problems = startup.startup_problems(times, args.budget_ms)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Xpense database maintenance")
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], help="defaults to XPENSE_BACKEND")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help="apply pending schema migrations").set_defaults(func=cmd_migrate)
+
+    check = commands.add_parser("check-plans", help="fail if a hot query does a full table scan")
+    check.add_argument("--userid", default="__plan_check__", help="user whose queries are explained")
+    check.set_defaults(func=cmd_check_plans)
+
+    reconcile = commands.add_parser("reconcile-totals", help="rebuild user_totals from the expense table")
+    reconcile.add_argument("--userid", help="only this user (default: everyone)")
+    reconcile.set_defaults(func=cmd_reconcile_totals)
+
+    verify = commands.add_parser("verify-rollups", help="fail if the daily/monthly rollups disagree with expense")
+    verify.add_argument("--userid", help="only this user (default: everyone)")
+    verify.set_defaults(func=cmd_verify_rollups)
+
+    rebuild = commands.add_parser("rebuild-rollups", help="recompute the daily/monthly rollups from expense")
+    rebuild.add_argument("--userid", help="only this user (default: everyone)")
+    rebuild.set_defaults(func=cmd_rebuild_rollups)
+
+    export = commands.add_parser("snapshot-export", help="write a user's ledger to an Arrow snapshot")
+    export.add_argument("userid")
+    export.add_argument("file")
+    export.add_argument("--period", default=ALL_TIME, help="Day, Week, Month, Quarter, Half-Year, Year, All or FROM..TO, e.g. 2024-01-01..2024-03-31 (default: All)")
+    export.set_defaults(func=cmd_snapshot_export)
+
+    restore = commands.add_parser("snapshot-restore", help="load an Arrow snapshot into a user's ledger")
+    restore.add_argument("userid")
+    restore.add_argument("file")
+    restore.add_argument("--replace", action="store_true", help="delete the user's current records first")
+    restore.set_defaults(func=cmd_snapshot_restore)
+
+    load = commands.add_parser("import", help="import a CSV export or bank statement into a user's ledger")
+    load.add_argument("userid")
+    load.add_argument("file")
+    load.add_argument("--date-format", help="strptime format for the date column, e.g. %%d/%%m/%%Y")
+    load.set_defaults(func=cmd_import)
+
+    report = commands.add_parser("startup-report", help="time the login screen's imports (-X importtime)")
+    report.add_argument("--budget-ms", type=int, default=startup.STARTUP_BUDGET_MS,
+                        help=f"fail above this many milliseconds (default {startup.STARTUP_BUDGET_MS})")
+    report.add_argument("--top", type=int, default=15, help="number of slowest modules to list")
+    report.set_defaults(func=cmd_startup_report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.func is cmd_startup_report:
+        # Needs no database
+        return args.func(None, args)
+    db = connect_backend(args.backend, migrate=False)
+    try:
+        if args.func is not cmd_migrate:
+            migrations.apply_migrations(db)
+        return args.func(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
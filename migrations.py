@@ -0,0 +1,389 @@
+"""Versioned schema migrations for the Xpense database.
+
+Each migration is (version, description, statements per dialect). The
+applied version is tracked in the schema_version table and
+apply_migrations() runs whatever is missing; connect_backend() calls it at
+startup. Migrations are append-only: never edit one that has shipped.
+
+check_query_plans() runs the app's hot queries under EXPLAIN and reports
+any that fall back to a full table scan.
+"""
+import re
+from datetime import datetime
+
+from periods import period_bounds
+
+SCHEMA_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INT NOT NULL PRIMARY KEY,
+    description VARCHAR(255) DEFAULT NULL,
+    applied_at DATETIME DEFAULT NULL
+)
+"""
+
+_TOTALS_BACKFILL = """
+INSERT INTO user_totals (userid, income, expenses, record_count, last_change)
+SELECT userid,
+       COALESCE(SUM(CASE WHEN expense_type IN ('Income', 'Allowance') THEN amount ELSE 0 END), 0),
+       COALESCE(SUM(CASE WHEN expense_type NOT IN ('Income', 'Allowance') THEN amount ELSE 0 END), 0),
+       COUNT(*),
+       MAX(date)
+FROM expense
+WHERE userid IS NOT NULL
+GROUP BY userid
+"""
+
+MIGRATIONS = [
+    (1, "Base schema from budget_planning.sql", {
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS userinfo (
+                userid VARCHAR(50) NOT NULL,
+                password VARCHAR(100) DEFAULT NULL,
+                user_name VARCHAR(50) DEFAULT NULL,
+                PRIMARY KEY (userid)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS expense (
+                id INT(11) NOT NULL AUTO_INCREMENT,
+                title VARCHAR(255) DEFAULT NULL,
+                userid VARCHAR(50) DEFAULT NULL,
+                date DATETIME DEFAULT NULL,
+                expense_type VARCHAR(50) DEFAULT NULL,
+                amount DECIMAL(10,2) DEFAULT NULL,
+                comment VARCHAR(255) DEFAULT NULL,
+                PRIMARY KEY (id),
+                KEY userid (userid),
+                CONSTRAINT expense_ibfk_1 FOREIGN KEY (userid) REFERENCES userinfo (userid)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS userinfo (
+                userid VARCHAR(50) NOT NULL PRIMARY KEY,
+                password VARCHAR(100) DEFAULT NULL,
+                user_name VARCHAR(50) DEFAULT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS expense (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title VARCHAR(255) DEFAULT NULL,
+                userid VARCHAR(50) DEFAULT NULL REFERENCES userinfo (userid),
+                date DATETIME DEFAULT NULL,
+                expense_type VARCHAR(50) DEFAULT NULL,
+                amount DECIMAL(10,2) DEFAULT NULL,
+                comment VARCHAR(255) DEFAULT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS userid ON expense (userid)",
+        ],
+    }),
+    (2, "Composite indexes for the dashboard queries", {
+        # (userid, date, id): trend and export, ordered by date then id
+        # (userid, expense_type, amount): summary sums and the pie GROUP BY, index-only
+        "mysql": [
+            "CREATE INDEX idx_expense_user_date ON expense (userid, date, id)",
+            "CREATE INDEX idx_expense_user_type_amount ON expense (userid, expense_type, amount)",
+        ],
+        "sqlite": [
+            "CREATE INDEX IF NOT EXISTS idx_expense_user_date ON expense (userid, date, id)",
+            "CREATE INDEX IF NOT EXISTS idx_expense_user_type_amount ON expense (userid, expense_type, amount)",
+        ],
+    }),
+    (3, "Per-user running totals", {
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS user_totals (
+                userid VARCHAR(50) NOT NULL,
+                income DECIMAL(14,2) NOT NULL DEFAULT 0,
+                expenses DECIMAL(14,2) NOT NULL DEFAULT 0,
+                record_count INT NOT NULL DEFAULT 0,
+                last_change DATETIME DEFAULT NULL,
+                PRIMARY KEY (userid)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci
+            """,
+            _TOTALS_BACKFILL,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS user_totals (
+                userid VARCHAR(50) NOT NULL PRIMARY KEY,
+                income DECIMAL(14,2) NOT NULL DEFAULT 0,
+                expenses DECIMAL(14,2) NOT NULL DEFAULT 0,
+                record_count INT NOT NULL DEFAULT 0,
+                last_change DATETIME DEFAULT NULL
+            )
+            """,
+            _TOTALS_BACKFILL,
+        ],
+    }),
+    (4, "Full-text search over title, category and comment", {
+        "mysql": [
+            "CREATE FULLTEXT INDEX ft_expense_text ON expense (title, expense_type, comment)",
+        ],
+        # External-content FTS5 table kept in step with expense by triggers
+        "sqlite": [
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS expense_fts USING fts5(
+                title, expense_type, comment, content='expense', content_rowid='id', prefix='2 3'
+            )
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS expense_fts_insert AFTER INSERT ON expense BEGIN
+                INSERT INTO expense_fts (rowid, title, expense_type, comment)
+                VALUES (new.id, new.title, new.expense_type, new.comment);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS expense_fts_delete AFTER DELETE ON expense BEGIN
+                INSERT INTO expense_fts (expense_fts, rowid, title, expense_type, comment)
+                VALUES ('delete', old.id, old.title, old.expense_type, old.comment);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS expense_fts_update AFTER UPDATE OF title, expense_type, comment ON expense BEGIN
+                INSERT INTO expense_fts (expense_fts, rowid, title, expense_type, comment)
+                VALUES ('delete', old.id, old.title, old.expense_type, old.comment);
+                INSERT INTO expense_fts (rowid, title, expense_type, comment)
+                VALUES (new.id, new.title, new.expense_type, new.comment);
+            END
+            """,
+            "INSERT INTO expense_fts (expense_fts) VALUES ('rebuild')",
+        ],
+    }),
+    (5, "Let bulk loads index search in one statement", {
+        # InnoDB maintains FULLTEXT indexes in batches at commit already
+        "mysql": [],
+        # Per-row FTS5 triggers cost far more than the insert itself, so a
+        # bulk load sets search_sync.deferred inside its transaction and
+        # indexes its rows with one INSERT ... SELECT before committing.
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS search_sync (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                deferred INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            "INSERT OR IGNORE INTO search_sync (id, deferred) VALUES (1, 0)",
+            "DROP TRIGGER IF EXISTS expense_fts_insert",
+            """
+            CREATE TRIGGER expense_fts_insert AFTER INSERT ON expense
+            WHEN NOT (SELECT deferred FROM search_sync) BEGIN
+                INSERT INTO expense_fts (rowid, title, expense_type, comment)
+                VALUES (new.id, new.title, new.expense_type, new.comment);
+            END
+            """,
+            "DROP TRIGGER IF EXISTS expense_fts_delete",
+            """
+            CREATE TRIGGER expense_fts_delete AFTER DELETE ON expense
+            WHEN NOT (SELECT deferred FROM search_sync) BEGIN
+                INSERT INTO expense_fts (expense_fts, rowid, title, expense_type, comment)
+                VALUES ('delete', old.id, old.title, old.expense_type, old.comment);
+            END
+            """,
+        ],
+    }),
+    (6, "Daily and monthly per-category rollups", {
+        # One row per (user, day or first day of month, category) with the sum
+        # and count of its records; kept in step by the backend's writes.
+        # Undated and uncategorised records are not rolled up.
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS expense_daily (
+                userid VARCHAR(50) NOT NULL,
+                day DATE NOT NULL,
+                expense_type VARCHAR(50) NOT NULL,
+                total DECIMAL(14,2) NOT NULL DEFAULT 0,
+                record_count INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (userid, day, expense_type)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS expense_monthly (
+                userid VARCHAR(50) NOT NULL,
+                month DATE NOT NULL,
+                expense_type VARCHAR(50) NOT NULL,
+                total DECIMAL(14,2) NOT NULL DEFAULT 0,
+                record_count INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (userid, month, expense_type)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci
+            """,
+            """
+            INSERT INTO expense_daily (userid, day, expense_type, total, record_count)
+            SELECT userid, DATE(date), expense_type, COALESCE(SUM(amount), 0), COUNT(*)
+            FROM expense
+            WHERE userid IS NOT NULL AND date IS NOT NULL AND expense_type IS NOT NULL
+            GROUP BY userid, DATE(date), expense_type
+            """,
+            """
+            INSERT INTO expense_monthly (userid, month, expense_type, total, record_count)
+            SELECT userid, day - INTERVAL (DAYOFMONTH(day) - 1) DAY, expense_type, SUM(total), SUM(record_count)
+            FROM expense_daily
+            GROUP BY userid, day - INTERVAL (DAYOFMONTH(day) - 1) DAY, expense_type
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS expense_daily (
+                userid VARCHAR(50) NOT NULL,
+                day DATE NOT NULL,
+                expense_type VARCHAR(50) NOT NULL,
+                total DECIMAL(14,2) NOT NULL DEFAULT 0,
+                record_count INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (userid, day, expense_type)
+            ) WITHOUT ROWID
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS expense_monthly (
+                userid VARCHAR(50) NOT NULL,
+                month DATE NOT NULL,
+                expense_type VARCHAR(50) NOT NULL,
+                total DECIMAL(14,2) NOT NULL DEFAULT 0,
+                record_count INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (userid, month, expense_type)
+            ) WITHOUT ROWID
+            """,
+            """
+            INSERT INTO expense_daily (userid, day, expense_type, total, record_count)
+            SELECT userid, date(date), expense_type, COALESCE(SUM(amount), 0), COUNT(*)
+            FROM expense
+            WHERE userid IS NOT NULL AND date IS NOT NULL AND expense_type IS NOT NULL
+            GROUP BY userid, date(date), expense_type
+            """,
+            """
+            INSERT INTO expense_monthly (userid, month, expense_type, total, record_count)
+            SELECT userid, date(day, 'start of month'), expense_type, SUM(total), SUM(record_count)
+            FROM expense_daily
+            GROUP BY userid, date(day, 'start of month'), expense_type
+            """,
+        ],
+    }),
+    (7, "Indexes for sorted table pages", {
+        # (userid, <sort column>, id): a page sorted by any ledger column is an
+        # index range read in order, with id as the tie-breaker
+        "mysql": [
+            "CREATE INDEX idx_expense_user_title ON expense (userid, title, id)",
+            "CREATE INDEX idx_expense_user_amount ON expense (userid, amount, id)",
+            "CREATE INDEX idx_expense_user_type ON expense (userid, expense_type, id)",
+            "CREATE INDEX idx_expense_user_comment ON expense (userid, comment, id)",
+        ],
+        "sqlite": [
+            "CREATE INDEX IF NOT EXISTS idx_expense_user_title ON expense (userid, title, id)",
+            "CREATE INDEX IF NOT EXISTS idx_expense_user_amount ON expense (userid, amount, id)",
+            "CREATE INDEX IF NOT EXISTS idx_expense_user_type ON expense (userid, expense_type, id)",
+            "CREATE INDEX IF NOT EXISTS idx_expense_user_comment ON expense (userid, comment, id)",
+        ],
+    }),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(backend):
+    """Highest applied migration, or 0 for a fresh database."""
+    with backend.pool.transaction() as cur:
+        cur.execute(SCHEMA_VERSION_TABLE)
+    version = backend._rows("SELECT MAX(version) FROM schema_version")[0][0]
+    return version or 0
+
+
+def apply_migrations(backend, target=None):
+    """Apply every pending migration up to target; returns the versions applied."""
+    target = LATEST_VERSION if target is None else target
+    applied = []
+    version = current_version(backend)
+    for number, description, statements in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+        with backend.pool.transaction() as cur:
+            for statement in statements[backend.dialect]:
+                cur.execute(statement)
+            cur.execute(
+                backend._sql("INSERT INTO schema_version (version, description, applied_at) VALUES (%s, %s, %s)"),
+                (number, description, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        applied.append(number)
+    return applied
+
+
+# --- Query plan checks ---
+
+# Every read the dashboard issues, as it is issued
+HOT_QUERIES = [
+    ("login", lambda db, userid: db.check_login(userid, "")),
+    ("table count", lambda db, userid: db.count_expenses(userid)),
+    ("table page", lambda db, userid: db.fetch_page(userid, 20)),
+    ("table page (keyset)", lambda db, userid: db.fetch_page(userid, 20, after=(0, 2 ** 31 - 1))),
+    ("table page (by title)", lambda db, userid: db.fetch_page(userid, 20, order_by="title", descending=False)),
+    ("table page (by amount, keyset)", lambda db, userid: db.fetch_page(userid, 20, after=(100, 2 ** 31 - 1),
+                                                                          order_by="amount")),
+    ("table page (by category, keyset)", lambda db, userid: db.fetch_page(
+        userid, 20, after=("Foods", 0), order_by="expense_type", descending=False)),
+    ("table page (by comment, after NULLs)", lambda db, userid: db.fetch_page(
+        userid, 20, after=(None, 2 ** 31 - 1), order_by="comment")),
+    ("summary totals", lambda db, userid: db.expense_totals(userid)),
+    ("pie categories", lambda db, userid: db.category_totals(userid)),
+    ("balance trend", lambda db, userid: db.balance_trend(userid, *period_bounds("Month"))),
+    ("balance trend (all time)", lambda db, userid: db.balance_trend(userid)),
+    ("balance trend (bucketed)", lambda db, userid: db.balance_trend(userid, *period_bounds("Year"), bucket="week")),
+    ("balance trend (monthly)", lambda db, userid: db.balance_trend(userid, bucket="month")),
+    ("first record", lambda db, userid: db.first_record_date(userid)),
+    ("export count", lambda db, userid: db.count_in_period(userid, *period_bounds("Month"))),
+    ("export", lambda db, userid: list(db.iter_expenses(userid, *period_bounds("Month")))),
+    ("search", lambda db, userid: db.search(userid, "food")),
+    ("dashboard snapshot", lambda db, userid: db.dashboard_snapshot(userid, 20, trend_window=period_bounds("Month"))),
+]
+
+# Hot queries (by name prefix) whose ORDER BY must be served by an index
+_ORDERED_QUERIES = ("table page",)
+
+# Tables that must always be reached through an index
+_CHECKED_TABLES = ("expense", "userinfo", "user_totals", "expense_daily", "expense_monthly")
+
+
+def _full_scans(dialect, columns, plan):
+    """Tables a plan reads in full."""
+    scans = []
+    if dialect == "sqlite":
+        # rows are (id, parent, notused, detail), e.g. "SCAN expense"
+        for row in plan:
+            match = re.match(r"SCAN (?:TABLE )?(\w+)", row[-1])
+            if match and match.group(1) in _CHECKED_TABLES:
+                scans.append(row[-1])
+    else:
+        table_col, type_col = columns.index("table"), columns.index("type")
+        for row in plan:
+            if row[table_col] in _CHECKED_TABLES and row[type_col] in ("ALL", "index"):
+                scans.append(f"{row[table_col]}: type={row[type_col]}")
+    return scans
+
+
+def _sorts(dialect, columns, plan):
+    """ORDER BY steps a plan runs as a separate sort instead of reading an index in order."""
+    if dialect == "sqlite":
+        return [row[-1] for row in plan if row[-1].startswith("USE TEMP B-TREE FOR ORDER BY")]
+    extra_col = columns.index("Extra")
+    return [f"{row[columns.index('table')]}: {row[extra_col]}" for row in plan
+            if row[extra_col] and "Using filesort" in row[extra_col]]
+
+
+def check_query_plans(backend, userid="__plan_check__"):
+    """EXPLAIN every hot query; returns a list of (query name, sql, problems).
+
+    An empty list means every hot query is served by an index, and every
+    table page is also read in index order rather than sorted. Run it
+    against a populated database: on tiny tables MySQL may prefer a scan.
+    """
+    failures = []
+    for name, run in HOT_QUERIES:
+        with backend.explaining() as plans:
+            run(backend, userid)
+        for sql, columns, plan in plans:
+            problems = _full_scans(backend.dialect, columns, plan)
+            if name.startswith(_ORDERED_QUERIES):
+                problems += _sorts(backend.dialect, columns, plan)
+            if problems:
+                failures.append((name, " ".join(sql.split()), problems))
+    return failures
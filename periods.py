@@ -0,0 +1,134 @@
+"""Reporting periods as datetime windows.
+
+Every window is half-open, [start, end), so consecutive periods never share
+a row and a query can use a plain index range: date >= start AND date < end.
+The export, the trend chart and manage.py all take their windows from here.
+"""
+from datetime import datetime, timedelta
+
+# Named periods, in the order the period pickers list them
+PERIODS = ["Day", "Week", "Month", "Quarter", "Half-Year", "Year"]
+
+# The whole history, e.g. manage.py's default --period
+ALL_TIME = "All"
+
+# Separates the two ends of a custom range, e.g. "2024-01-01..2024-03-31"
+RANGE_SEPARATOR = ".."
+
+# Shown beside the period pickers, which also accept a typed custom range
+RANGE_HINT = "or type YYYY-MM-DD..YYYY-MM-DD"
+
+
+def _month_start(year, month):
+    # month may run past 12; roll it into the following year
+    year += (month - 1) // 12
+    return datetime(year, (month - 1) % 12 + 1, 1)
+
+
+def _range_end(text):
+    """Exclusive end for the last day or moment of a custom range."""
+    end = datetime.fromisoformat(text)
+    # A plain date includes that whole day
+    return end + timedelta(days=1) if len(text) <= 10 else end
+
+
+def custom_bounds(text):
+    """(start, end) of a custom range "FROM..TO"; raises ValueError if it is malformed.
+
+    Both ends are ISO dates (or date-times) and TO is inclusive, so
+    "2024-01-01..2024-03-31" is the first quarter of 2024. Either end may be
+    left out for an open range: "2024-07-01.." is everything since July 2024.
+    """
+    first, separator, last = text.partition(RANGE_SEPARATOR)
+    if not separator:
+        raise ValueError(f"not a date range: {text!r} (expected FROM{RANGE_SEPARATOR}TO)")
+    first, last = first.strip(), last.strip()
+    try:
+        start = datetime.fromisoformat(first) if first else None
+        end = _range_end(last) if last else None
+    except ValueError:
+        raise ValueError(f"not a date range: {text!r} (dates are YYYY-MM-DD)") from None
+    if start is not None and end is not None and start >= end:
+        raise ValueError(f"date range ends before it starts: {text!r}")
+    return start, end
+
+
+def period_label(period):
+    """File-name friendly form of a period, e.g. "halfyear" or "2024-01-01_to_2024-03-31"."""
+    if RANGE_SEPARATOR not in period:
+        return "".join(c for c in period.lower() if c.isalnum())
+    text = period.lower().replace(RANGE_SEPARATOR, "_to_").strip("_")
+    return "".join(c for c in text if c.isalnum() or c in "-_")
+
+
+def period_bounds(period, now=None):
+    """(start, end) of the period containing now, or of a custom range.
+
+    - Day: today
+    - Week: the last seven days, today included
+    - Month: the current calendar month
+    - Quarter: the current calendar quarter
+    - Half-Year: January-June or July-December
+    - Year: the current calendar year
+    - "FROM..TO": a custom range, see custom_bounds()
+    - All: all time, (None, None)
+
+    Names are matched case-insensitively; anything else raises ValueError,
+    so a mistyped period never silently means the whole history.
+    """
+    if RANGE_SEPARATOR in period:
+        return custom_bounds(period)
+    names = {name.lower(): name for name in (*PERIODS, ALL_TIME)}
+    if period.strip().lower() not in names:
+        raise ValueError(f"unknown period {period!r}: use {', '.join(PERIODS)}, {ALL_TIME} "
+                         f"or a range FROM{RANGE_SEPARATOR}TO")
+    period = names[period.strip().lower()]
+    now = now or datetime.now()
+    today = datetime(now.year, now.month, now.day)
+    if period == "Day":
+        return today, today + timedelta(days=1)
+    if period == "Week":
+        return today - timedelta(days=6), today + timedelta(days=1)
+    if period == "Month":
+        return _month_start(now.year, now.month), _month_start(now.year, now.month + 1)
+    if period == "Quarter":
+        first = now.month - (now.month - 1) % 3
+        return _month_start(now.year, first), _month_start(now.year, first + 3)
+    if period == "Half-Year":
+        first = 1 if now.month <= 6 else 7
+        return _month_start(now.year, first), _month_start(now.year, first + 6)
+    if period == "Year":
+        return datetime(now.year, 1, 1), datetime(now.year + 1, 1, 1)
+    return None, None  # ALL_TIME
+
+
+# Server-side trend buckets, finest first, with their (approximate) widths
+TREND_BUCKETS = [
+    ("day", timedelta(days=1)),
+    ("week", timedelta(weeks=1)),
+    ("month", timedelta(days=30)),
+]
+
+
+def trend_bucket(start, end, points, first=None, now=None):
+    """Bucket for plotting [start, end) in about `points` pixels, or None for raw rows.
+
+    Raw rows are kept while even daily buckets would leave the plot sparse
+    (fewer than one per four pixels); otherwise the finest bucket that fits
+    in the width is used. An open end is taken as now and an open start as
+    first, the date of the user's oldest record; without first an open
+    range gets monthly buckets.
+    """
+    if points <= 0:
+        return None
+    if start is None:
+        if first is None:
+            return TREND_BUCKETS[-1][0]
+        start = first
+    span = (end or now or datetime.now()) - start
+    if span / TREND_BUCKETS[0][1] < points / 4:
+        return None
+    for name, width in TREND_BUCKETS:
+        if span / width <= points:
+            return name
+    return TREND_BUCKETS[-1][0]
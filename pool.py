@@ -0,0 +1,165 @@
+"""Thread-safe database connection pool used by the storage backends."""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the pool timeout."""
+
+
+# Put on the idle queue when a connection is thrown away, so a caller
+# waiting for a connection wakes up and opens a new one in its place
+_SLOT_FREED = (None, None)
+
+
+class ConnectionPool:
+    """Fixed-size pool of DB-API connections.
+
+    Connections are opened lazily up to `size`. A connection that has been
+    idle for more than `check_after` seconds is pinged before it is handed
+    out and silently replaced if the ping fails. A connection that raises an
+    error for which `is_disconnect(exc)` is true is thrown away instead of
+    going back to the pool, so the next caller gets a fresh one.
+    """
+
+    def __init__(self, connect, size=4, ping=None, is_disconnect=None,
+                 begin=None, check_after=30.0, timeout=10.0):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self._connect = connect
+        self._ping = ping
+        self._is_disconnect = is_disconnect or (lambda exc: False)
+        self._begin = begin
+        self.size = size
+        self.check_after = check_after
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        # Optional cursor -> cursor wrapper applied to every cursor handed out (see diagnostics.py)
+        self.trace = None
+
+    def is_disconnect(self, exc):
+        return self._is_disconnect(exc)
+
+    def _free_slot(self):
+        with self._lock:
+            self._created -= 1
+        if not self._closed:
+            self._idle.put(_SLOT_FREED)
+
+    def _open(self):
+        try:
+            return self._connect()
+        except Exception:
+            self._free_slot()
+            raise
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._free_slot()
+
+    def _healthy(self, conn, last_used):
+        if self._ping is None or time.monotonic() - last_used < self.check_after:
+            return True
+        try:
+            self._ping(conn)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Take a connection out of the pool, opening or repairing one if needed."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._created < self.size
+                    if can_open:
+                        self._created += 1
+                if can_open:
+                    return self._open()
+                try:
+                    conn, last_used = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    raise PoolTimeout(f"No free connection after {self.timeout}s") from None
+            if conn is None:
+                # A connection was discarded; loop to open one in its place
+                continue
+            if self._healthy(conn, last_used):
+                return conn
+            # Dead connection: drop it and loop to reconnect
+            self._discard(conn)
+
+    def release(self, conn, broken=False):
+        if broken or self._closed:
+            self._discard(conn)
+        else:
+            self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except Exception as e:
+            broken = self.is_disconnect(e)
+            raise
+        finally:
+            self.release(conn, broken)
+
+    def new_cursor(self, conn):
+        """A cursor on conn, wrapped by self.trace when tracing is on."""
+        cur = conn.cursor()
+        return cur if self.trace is None else self.trace(cur)
+
+    @contextmanager
+    def cursor(self):
+        """Scoped cursor for reads; always closed, connection always returned."""
+        with self.connection() as conn:
+            cur = self.new_cursor(conn)
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    @contextmanager
+    def transaction(self):
+        """Scoped cursor inside a transaction: commit on success, roll back on error."""
+        with self.connection() as conn:
+            if self._begin is not None:
+                self._begin(conn)
+            cur = self.new_cursor(conn)
+            try:
+                yield cur
+                conn.commit()
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+            finally:
+                cur.close()
+
+    def close(self):
+        """Close every idle connection; busy ones are closed when released."""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not None:
+                self._discard(conn)
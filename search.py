@@ -0,0 +1,79 @@
+"""Full-text search terms for the expense search.
+
+Search is by word prefix over title, category and comment: every word of
+the term must start some word of the record, case-insensitively ("gro
+sup" matches "Groceries" with comment "supermarket"). The same rule is
+turned into an FTS5 MATCH expression for SQLite and a boolean-mode
+MATCH ... AGAINST expression for MySQL's FULLTEXT index, and checked in
+Python by row_matches() when a cached result set is narrowed.
+"""
+import re
+import unicodedata
+
+SEARCH_PAGE_SIZE = 100
+
+# Letters and digits; like FTS5's unicode61 tokenizer, "_" separates words
+_WORD = re.compile(r"[^\W_]+")
+
+
+def tokens(term):
+    """Case- and accent-folded words of a search term; punctuation only separates words."""
+    folded = unicodedata.normalize("NFKD", term or "")
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return [word.casefold() for word in _WORD.findall(folded)]
+
+
+def fts5_query(words):
+    # Quoted so FTS5 operators (AND, NEAR, -) in user input stay plain words
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def boolean_query(words):
+    return " ".join(f"+{word}*" for word in words)
+
+
+def row_matches(row, words):
+    """Whether an (id, title, expense_type, amount, comment) row matches every search word."""
+    text = tokens(" ".join(value for value in (row[1], row[2], row[4]) if value))
+    return all(any(token.startswith(word) for token in text) for word in words)
+
+
+def narrows(previous, words):
+    """Whether every match for words is also a match for previous.
+
+    True when each earlier word is a prefix of the word typed in its place
+    (words may add more), which is how a term grows while typing.
+    """
+    return len(words) >= len(previous) and all(new.startswith(old) for old, new in zip(previous, words))
+
+
+class SearchCache:
+    """The last complete search result, reused while the user keeps typing.
+
+    A result is only kept when it was not cut off by the page size, since
+    then every match of a longer term is already in it. It is filed under
+    the data version read before the search ran (StorageBackend.data_version)
+    and only served while that version is current, so any write retires it.
+    """
+
+    def __init__(self):
+        self.words = None
+        self.rows = None
+        self.version = None
+
+    def store(self, words, rows, limit, version):
+        if len(rows) < limit and version is not None:
+            self.words, self.rows, self.version = list(words), list(rows), version
+        else:
+            self.clear()
+
+    def narrow(self, words, version):
+        """Matching rows for words from the cache, in cached order, or None to ask the database."""
+        if self.words is None or version != self.version or not narrows(self.words, words):
+            return None
+        return [row for row in self.rows if row_matches(row, words)]
+
+    def clear(self):
+        self.words = None
+        self.rows = None
+        self.version = None
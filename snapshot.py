@@ -0,0 +1,99 @@
+"""Columnar ledger snapshots in the Arrow IPC file format.
+
+A snapshot holds one user's records with their real types (DECIMAL
+amounts, second-resolution timestamps) instead of CSV text. It is written
+a chunk at a time straight from the database cursor. It is read through a
+memory map, so opening even a large snapshot for analysis is zero-copy:
+
+    table = snapshot.read_snapshot("ledger.arrow")
+    table.group_by("expense_type").aggregate([("amount", "sum")])
+
+pyarrow is only needed for snapshots and is imported on first use.
+"""
+from decimal import Decimal
+
+from storage import EXPENSE_COLUMNS
+
+SNAPSHOT_CHUNK = 50000
+
+# Columns stored in a snapshot; ids and the owner are reassigned on restore
+SNAPSHOT_COLUMNS = ("id", "date", "title", "expense_type", "amount", "comment")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute  # noqa: F401  (makes pyarrow.compute available)
+    except ImportError:
+        raise ImportError("Ledger snapshots need pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+
+def snapshot_schema(pa, userid=""):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.timestamp("s")),
+        ("title", pa.string()),
+        ("expense_type", pa.string()),
+        ("amount", pa.decimal128(10, 2)),
+        ("comment", pa.string()),
+    ], metadata={"xpense.userid": str(userid)})
+
+
+def _batch(pa, schema, rows):
+    columns = [list(column) for column in zip(*rows)]
+    arrays = []
+    for name in SNAPSHOT_COLUMNS:
+        values = columns[EXPENSE_COLUMNS.index(name)]
+        field = schema.field(name)
+        if name == "amount" and not any(isinstance(value, Decimal) for value in values):
+            # SQLite hands back floats; round before narrowing to DECIMAL(10,2)
+            arrays.append(pa.compute.round(pa.array(values, pa.float64()), 2).cast(field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_snapshot(backend, userid, path, start=None, end=None, chunk_size=SNAPSHOT_CHUNK):
+    """Write the user's records dated in [start, end) to an Arrow IPC file; returns the row count."""
+    pa = _pyarrow()
+    schema = snapshot_schema(pa, userid)
+    count = 0
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for rows in backend.iter_expenses(userid, start, end, chunk_size):
+            writer.write_batch(_batch(pa, schema, rows))
+            count += len(rows)
+    return count
+
+
+def read_snapshot(path):
+    """Memory-map a snapshot and return it as a pyarrow Table (no copy of the data)."""
+    pa = _pyarrow()
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _snapshot_rows(pa, table):
+    # One batch of Python values at a time keeps restore memory bounded.
+    # Dates are formatted in Arrow rather than per row in Python; amounts stay
+    # Decimal, as a float cast would turn 167.17 into 167.17000000000002.
+    for batch in table.to_batches(max_chunksize=SNAPSHOT_CHUNK):
+        yield from zip(
+            pa.compute.strftime(batch.column("date"), "%Y-%m-%d %H:%M:%S").to_pylist(),
+            batch.column("title").to_pylist(),
+            batch.column("expense_type").to_pylist(),
+            batch.column("amount").to_pylist(),
+            batch.column("comment").to_pylist(),
+        )
+
+
+def restore_snapshot(backend, userid, path, replace=False):
+    """Insert a snapshot's records for userid in one transaction; returns the row count.
+
+    Records get new ids. With replace=True the user's current records are
+    deleted first, in the same transaction, so a failed restore changes
+    nothing.
+    """
+    pa = _pyarrow()
+    table = read_snapshot(path)
+    return backend.insert_expenses(userid, _snapshot_rows(pa, table), replace=replace)
@@ -0,0 +1,62 @@
+"""What the login screen may import, and how long it may take.
+
+The login screen only needs the widget toolkit and the storage layer.
+Everything heavier (the charts and their matplotlib/numpy stack, pyarrow,
+the MySQL driver) is imported on a background thread while the user types
+their credentials, or on first use, and must not creep back into the
+startup path. `python manage.py startup-report` checks both, using the
+interpreter's own `-X importtime` measurements.
+"""
+import importlib
+import re
+import subprocess
+import sys
+
+# Imported by Expense-Tracker.py before the login screen is shown
+LOGIN_MODULES = ("customtkinter", "storage", "periods", "search", "tasks", "ledger", "exporter", "importer",
+                 "startup", "diagnostics")
+
+# Must not be imported before the login screen; charts and downsample pull in matplotlib and numpy
+DEFERRED_MODULES = ("charts", "downsample", "matplotlib", "numpy", "pandas", "pyarrow", "mysql")
+
+# Budget for importing LOGIN_MODULES in a fresh interpreter
+STARTUP_BUDGET_MS = 500
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def preload_plotting():
+    """Import the Graph tab's modules so the first visit to it does not wait for them."""
+    importlib.import_module("charts")
+
+
+def import_times(modules=LOGIN_MODULES):
+    """[(module, self_us, cumulative_us, depth)] from importing modules in a fresh interpreter.
+
+    Raises RuntimeError with the interpreter's output if an import fails.
+    """
+    code = "; ".join(f"import {name}" for name in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    times = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return times
+
+
+def startup_problems(times, budget_ms=STARTUP_BUDGET_MS):
+    """Budget and deferred-import violations in import_times() output (empty when fine)."""
+    problems = []
+    total_ms = sum(cumulative for _, _, cumulative, depth in times if depth == 0) / 1000
+    if total_ms > budget_ms:
+        problems.append(f"startup imports take {total_ms:.0f} ms, budget is {budget_ms} ms")
+    loaded = {name for name, _, _, _ in times}
+    for name in DEFERRED_MODULES:
+        if name in loaded:
+            problems.append(f"{name} is imported before the login screen")
+    return problems
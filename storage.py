@@ -0,0 +1,976 @@
+"""Storage backends for Xpense.
+
+Every query the app issues goes through a backend object so the UI never
+touches a database connection directly. Two backends ship:
+
+- MySQLBackend: the original MySQL/MariaDB database (budget_planning.sql)
+- SQLiteBackend: an embedded single-file database with the same schema
+
+The schema itself is created and upgraded by migrations.py.
+
+Pick one with the XPENSE_BACKEND environment variable ("mysql" or "sqlite").
+Both run on a ConnectionPool (XPENSE_POOL_SIZE connections, default 4) so
+the table, summary and charts can read concurrently from worker threads.
+Read results are kept in a QueryCache (cache.py, XPENSE_CACHE_MB megabytes,
+default 32, 0 to disable) until a write through the backend changes the
+user's data.
+"""
+import itertools
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from cache import CACHE_BUDGET, QueryCache
+from pool import ConnectionPool
+from search import SEARCH_PAGE_SIZE, boolean_query, fts5_query, tokens
+
+# Categories counted as money coming in; everything else is an expense
+INCOME_TYPES = ("Income", "Allowance")
+
+# Categories offered when recording or importing a transaction
+CATEGORIES = INCOME_TYPES + (
+    "Supermarket", "Transport", "Shopping", "Foods", "Drinks", "Restaurants", "Cafes",
+    "Fast Food", "Online services", "Housing and utilities", "Transfers to other people", "Other",
+)
+
+MYSQL_CONFIG = {
+    "database": "budget_planning",
+    "user": "root",
+    "host": "localhost",
+    "password": "",
+    "port": 3307,
+}
+
+SQLITE_PATH = "xpense.db"
+
+POOL_SIZE = 4
+
+# Ledger columns that may appear in ORDER BY (whitelisted, never user SQL).
+# Each has a (userid, column, id) index (migration 7). NULLs sort lowest,
+# as they do in those indexes: first ascending, last descending.
+SORT_COLUMNS = ("id", "title", "amount", "expense_type", "comment")
+
+# Columns of an expense row as exported and imported
+EXPENSE_COLUMNS = ("id", "userid", "date", "title", "expense_type", "amount", "comment")
+
+# Rows per fetchmany() when streaming a user's history
+STREAM_CHUNK = 2000
+
+# Rows per executemany() batch for bulk inserts
+BULK_CHUNK = 5000
+
+# Pieces of the dashboard that dashboard_snapshot() can return
+DASHBOARD_PARTS = ("totals", "categories", "page", "trend")
+
+# Position of each sort column in a table page row
+_PAGE_ROW_INDEX = {"id": 0, "title": 1, "expense_type": 2, "amount": 3, "comment": 4}
+
+def _income_list():
+    return ", ".join(f"'{t}'" for t in INCOME_TYPES)
+
+
+# income, expenses, record_count aggregated from expense rows
+_TOTALS_COLUMNS = f"""
+    COALESCE(SUM(CASE WHEN expense_type IN ({_income_list()}) THEN amount ELSE 0 END), 0),
+    COALESCE(SUM(CASE WHEN expense_type NOT IN ({_income_list()}) THEN amount ELSE 0 END), 0),
+    COUNT(*)
+"""
+
+
+# Signed effect of a row on the balance, with the same NULL handling as the totals
+_SIGNED_AMOUNT = f"""
+    CASE WHEN expense_type IN ({_income_list()}) THEN COALESCE(amount, 0)
+         WHEN expense_type IS NULL THEN 0
+         ELSE -COALESCE(amount, 0) END
+"""
+
+# Rollup tables (see migration 6) and their period column: per (user, period, category)
+# sums and counts of the dated, categorised records
+ROLLUPS = (("expense_daily", "day"), ("expense_monthly", "month"))
+
+# Signed effect of a rollup row on the balance (rollup rows always have a category)
+_SIGNED_TOTAL = f"CASE WHEN expense_type IN ({_income_list()}) THEN total ELSE -total END"
+
+# (expense_type, amount) rows behind the pie: the monthly rollups plus the few undated
+# records, which are not rolled up. Params: userid, userid.
+_CATEGORY_SOURCE = """
+    SELECT expense_type, total AS amount FROM expense_monthly WHERE userid = %s
+    UNION ALL
+    SELECT expense_type, amount FROM expense WHERE userid = %s AND date IS NULL
+"""
+
+
+def split_amount(expense_type, amount):
+    """(income, expense) contribution of one row, matching the SQL IN / NOT IN filters."""
+    amount = float(amount or 0)
+    if expense_type is None:
+        return 0.0, 0.0
+    if expense_type in INCOME_TYPES:
+        return amount, 0.0
+    return 0.0, amount
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _to_datetime(value):
+    # SQLite only applies the DATETIME converter to plain column reads
+    if isinstance(value, (str, bytes)):
+        return datetime.fromisoformat(value.decode() if isinstance(value, bytes) else value)
+    # Rollup periods come back as dates
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+def _period_start(moment, period):
+    """The day or first of the month containing a datetime."""
+    day = moment.date()
+    return day if period == "day" else day.replace(day=1)
+
+
+def _rollup_window(start, end, period):
+    """(first, stop) of the rollup periods overlapping the datetime window [start, end).
+
+    Either bound may be None (unbounded). A period that starts before end
+    is included, so a window that cuts a day or month in two gets all of it.
+    """
+    first = _period_start(start, period) if start is not None else None
+    stop = None
+    if end is not None:
+        stop = _period_start(end, period)
+        if datetime(stop.year, stop.month, stop.day) < end:
+            stop = stop + timedelta(days=1) if period == "day" else (
+                stop.replace(year=stop.year + stop.month // 12, month=stop.month % 12 + 1))
+    return first, stop
+
+
+def _rollup_changes(rows):
+    """{(day, expense_type): [amount, count]} deltas from (date, expense_type, amount, count) rows.
+
+    A removed record is passed with a negative amount and count -1.
+
+    Undated and uncategorised rows are not rolled up and are skipped.
+    """
+    changes = {}
+    for moment, expense_type, amount, count in rows:
+        if moment is None or expense_type is None:
+            continue
+        change = changes.setdefault((_to_datetime(moment).date(), expense_type), [0.0, 0])
+        change[0] += float(amount or 0)
+        change[1] += count
+    return changes
+
+
+def page_key(row, order_by="id"):
+    """Keyset cursor (sort value, id) for a table page row; pass it as `after`."""
+    return row[_PAGE_ROW_INDEX[order_by]], row[0]
+
+
+class StorageBackend:
+    """Base class holding the SQL shared by every backend.
+
+    Queries are written with %s placeholders; backends that use a different
+    paramstyle translate them in _sql(). Subclasses set self.pool to a
+    ConnectionPool before any query runs.
+    """
+
+    dialect = None
+    placeholder = "%s"
+    explain_prefix = "EXPLAIN"
+    lock_suffix = ""
+    pool = None
+    # Optional QueryCache for reads; every write through this backend invalidates the user's entries
+    cache = None
+    _plans = None
+    # Add a delta to a user's row in user_totals, creating it if needed
+    _totals_upsert = None
+    # GROUP BY expressions for balance_trend() buckets; weeks start on Monday
+    trend_buckets = {}
+    # Add deltas to a rollup row, creating it if needed; format with table= and period=
+    _rollup_upsert = None
+    # The Monday of a rollup row's day (the "week" bucket read from expense_daily)
+    rollup_week = None
+    # Turns search words into the full-text engine's query syntax
+    match_query = None
+
+    def _sql(self, query):
+        if self.placeholder == "%s":
+            return query
+        return query.replace("%s", self.placeholder)
+
+    def _query(self, query, params=()):
+        """Run a SELECT and return (columns, rows).
+
+        Reads are retried once on a fresh connection if the server dropped us.
+        """
+        if self._plans is not None:
+            self._record_plan(query, params)
+        for attempt in range(2):
+            try:
+                with self.pool.cursor() as cur:
+                    cur.execute(self._sql(query), params)
+                    rows = cur.fetchall()
+                    columns = [desc[0] for desc in cur.description]
+                    return columns, rows
+            except Exception as e:
+                if attempt or not self.pool.is_disconnect(e):
+                    raise
+
+    def _record_plan(self, query, params):
+        with self.pool.cursor() as cur:
+            cur.execute(self._sql(f"{self.explain_prefix} {query}"), params)
+            plan = cur.fetchall()
+            columns = [desc[0] for desc in cur.description]
+        self._plans.append((query, columns, plan))
+
+    @contextmanager
+    def explaining(self):
+        """Collect (sql, columns, plan) for every read issued inside the block."""
+        self._plans = []
+        try:
+            yield self._plans
+        finally:
+            self._plans = None
+
+    def _rows(self, query, params=()):
+        return self._query(query, params)[1]
+
+    def _cached(self, userid, name, params, compute):
+        """compute() through the query cache, keyed by (userid, name, params)."""
+        if self.cache is None or self._plans is not None:
+            return compute()
+        return self.cache.get_or_compute(userid, name, params, compute)
+
+    def data_version(self, userid):
+        """Opaque version of userid's data that changes on every write; None when reads aren't cached."""
+        if self.cache is None:
+            return None
+        return self.cache.version(userid)
+
+    @contextmanager
+    def _writing(self, userid):
+        """Write transaction for userid's data (everyone's when None); invalidates cached reads.
+
+        The version is bumped once the transaction has ended, so a read that
+        starts before the commit is never filed under the new version.
+        """
+        try:
+            with self.pool.transaction() as cur:
+                yield cur
+        finally:
+            if self.cache is not None:
+                self.cache.bump(userid)
+
+    def _execute(self, query, params=()):
+        """Run a statement in its own transaction and return the row count."""
+        with self.pool.transaction() as cur:
+            cur.execute(self._sql(query), params)
+            return cur.rowcount
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+
+    # --- Users ---
+    def user_exists(self, userid):
+        return bool(self._rows("SELECT userid FROM userinfo WHERE userid = %s", (userid,)))
+
+    def check_login(self, userid, password):
+        return bool(self._rows(
+            "SELECT userid, password FROM userinfo WHERE userid = %s AND password = %s",
+            (userid, password)))
+
+    def create_user(self, userid, password, user_name):
+        self._execute(
+            "INSERT INTO userinfo (userid, password, user_name) VALUES (%s, %s, %s)",
+            (userid, password, user_name))
+
+    # --- Expense reads ---
+    def _period_where(self, userid, start, end):
+        """WHERE clause and params for a user's rows dated in [start, end); None means unbounded."""
+        where, params = "userid = %s", [userid]
+        if start is not None:
+            where += " AND date >= %s"
+            params.append(start)
+        if end is not None:
+            where += " AND date < %s"
+            params.append(end)
+        return where, params
+
+    def count_in_period(self, userid, start=None, end=None):
+        """Number of records dated in [start, end); the whole history when both are None."""
+        if start is None and end is None:
+            return self.count_expenses(userid)
+        where, params = self._period_where(userid, start, end)
+        return self._cached(userid, "count_in_period", (start, end), lambda: self._rows(
+            f"SELECT COUNT(*) FROM expense WHERE {where}", params)[0][0])
+
+    def first_record_date(self, userid):
+        """Date of the user's oldest dated record, or None; read from the (userid, date) index."""
+        return self._cached(userid, "first_record_date", (), lambda: _to_datetime(self._rows(
+            "SELECT MIN(date) FROM expense WHERE userid = %s", (userid,))[0][0]))
+
+    def iter_expenses(self, userid, start=None, end=None, chunk_size=STREAM_CHUNK):
+        """Yield lists of EXPENSE_COLUMNS rows dated in [start, end), oldest first.
+
+        Rows are streamed from one pooled connection with fetchmany() (an
+        unbuffered cursor on MySQL), so memory stays bounded by chunk_size.
+        If the caller stops early the half-read connection is discarded
+        rather than returned to the pool.
+        """
+        where, params = self._period_where(userid, start, end)
+        query = f"SELECT {', '.join(EXPENSE_COLUMNS)} FROM expense WHERE {where} ORDER BY date ASC, id ASC"
+        if self._plans is not None:
+            self._record_plan(query, params)
+        conn = self.pool.acquire()
+        finished = False
+        cur = self.pool.new_cursor(conn)
+        try:
+            cur.execute(self._sql(query), params)
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+            finished = True
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                finished = False
+            self.pool.release(conn, broken=not finished)
+
+    def user_totals(self, userid):
+        """Stored (income, expenses, record_count, last_change) for a user."""
+        rows = self._cached(userid, "user_totals", (), lambda: self._rows(
+            "SELECT income, expenses, record_count, last_change FROM user_totals WHERE userid = %s",
+            (userid,)))
+        if not rows:
+            return 0.0, 0.0, 0, None
+        income, expenses, count, last_change = rows[0]
+        return float(income), float(expenses), count, last_change
+
+    def count_expenses(self, userid):
+        """Row count for a user, read from user_totals instead of COUNT(*)."""
+        return self.user_totals(userid)[2]
+
+    def fetch_page(self, userid, limit, after=None, order_by="id", descending=True):
+        """One table page of (id, title, expense_type, amount, comment) rows.
+
+        Sorted by order_by (one of SORT_COLUMNS) with id as the tie-breaker.
+        Pages are seek-based: `after` is page_key() of the last row of the
+        previous page, so deep pages cost the same as the first one.
+        """
+        where, order, params = self._page_clauses(userid, after, order_by, descending)
+
+        def fetch():
+            rows = self._rows(
+                f"SELECT id, title, expense_type, amount, comment FROM expense WHERE {where} ORDER BY {order} LIMIT %s",
+                (*params, limit))
+            return rows + self._page_tail(userid, len(rows), limit, after, order_by, descending)
+
+        return self._cached(userid, "fetch_page", (limit, after, order_by, descending), fetch)
+
+    def _page_clauses(self, userid, after, order_by, descending):
+        """WHERE, ORDER BY and params for a keyset table page.
+
+        Every case is a single range of the (userid, order_by, id) index.
+        A descending page that starts at a non-NULL value stops short of
+        the NULLs sorted after it; _page_tail() fetches those.
+        """
+        if order_by not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {order_by!r}")
+        column = order_by
+        direction, op = ("DESC", "<") if descending else ("ASC", ">")
+        where = "userid = %s"
+        params = [userid]
+        if after is not None:
+            value, last_id = after
+            if order_by == "id":
+                where += f" AND id {op} %s"
+                params.append(last_id)
+            elif value is None and descending:
+                where += f" AND {column} IS NULL AND id < %s"
+                params.append(last_id)
+            elif value is None:
+                where += f" AND ({column} IS NOT NULL OR id > %s)"
+                params.append(last_id)
+            else:
+                where += f" AND {column} {op}= %s AND ({column} {op} %s OR id {op} %s)"
+                params += [value, value, last_id]
+        order = f"id {direction}" if order_by == "id" else f"{column} {direction}, id {direction}"
+        return where, order, params
+
+    def _page_tail(self, userid, count, limit, after, order_by, descending):
+        """Rows with a NULL sort value that complete a short descending page (see _page_clauses)."""
+        if (count >= limit or not descending or order_by == "id"
+                or after is None or after[0] is None):
+            return []
+        return self._rows(
+            f"SELECT id, title, expense_type, amount, comment FROM expense "
+            f"WHERE userid = %s AND {order_by} IS NULL ORDER BY id DESC LIMIT %s",
+            (userid, limit - count))
+
+    def expense_totals(self, userid):
+        """Return (total_income, total_expenses) as floats, in constant time."""
+        return self.user_totals(userid)[:2]
+
+    def category_totals(self, userid):
+        """Expense sums per category (income types excluded), read from the monthly rollups."""
+        return self._cached(userid, "category_totals", (), lambda: self._rows(
+            f"SELECT expense_type, SUM(amount) FROM ({_CATEGORY_SOURCE}) AS source "
+            f"WHERE expense_type NOT IN ({_income_list()}) GROUP BY expense_type",
+            (userid, userid)))
+
+    def _trend_clauses(self, userid, start, end, bucket=None):
+        """(date, balance, order, tail, params) for the trend over [start, end).
+
+        The opening balance comes from _opening_balance(); rows without a
+        date count as the oldest. The running balance inside the window is a
+        window-function SUM in posting order. With a
+        bucket ("day", "week" or "month") the points come from the rollup
+        tables instead, one per period with its closing balance, so the cost
+        follows the number of periods rather than of records; a period cut
+        by the window is included whole. tail is the FROM/WHERE/GROUP BY
+        part of the statement.
+        """
+        if bucket is None:
+            table, date, signed = "expense", "date", _SIGNED_AMOUNT
+            lower, lower_params = ("date >= %s", [start]) if start is not None else ("date IS NOT NULL", [])
+            upper, upper_params = ("date < %s", [end]) if end is not None else (None, [])
+            order, group = "date, id", ""
+        else:
+            table, period = ROLLUPS[0] if bucket in ("day", "week") else ROLLUPS[1]
+            first, stop = _rollup_window(start, end, period)
+            lower, lower_params = (f"{period} >= %s", [first]) if first is not None else (None, [])
+            upper, upper_params = (f"{period} < %s", [stop]) if stop is not None else (None, [])
+            date = self.rollup_week if bucket == "week" else period
+            order, group, signed = date, f" GROUP BY {date}", _SIGNED_TOTAL
+            # The first period is included whole, so the opening balance is taken at its start
+            start = _to_datetime(first) if first is not None else None
+        opening, opening_params = self._opening_balance(userid, start)
+        where = " AND ".join(filter(None, ["userid = %s", lower, upper]))
+        params = [*opening_params, userid, *lower_params, *upper_params]
+        tail = f"FROM {table} WHERE {where}{group}"
+        running = f"SUM({signed})" if bucket is None else f"SUM(SUM({signed}))"
+        balance = f"{opening} + {running} OVER (ORDER BY {order} ROWS UNBOUNDED PRECEDING)"
+        return date, balance, order, tail, params
+
+    def _opening_balance(self, userid, start):
+        """(expression, params) for the balance of everything posted before start.
+
+        That is the user's current balance minus what was posted at or after
+        start, read from the rollups: whole months from expense_monthly, the
+        days before the first of those from expense_daily, and raw records
+        only for the partial day start falls in. The cost follows the number
+        of months since start, not the number of records. Without a start it
+        is the sum of the undated records, which count as the oldest.
+        """
+        if start is None:
+            return f"COALESCE((SELECT SUM({_SIGNED_AMOUNT}) FROM expense WHERE userid = %s AND date IS NULL), 0)", [
+                userid]
+        # First whole day and first whole month at or after start
+        day = _rollup_window(None, start, "day")[1]
+        month = _rollup_window(None, _to_datetime(day), "month")[1]
+        later = [(f"SELECT SUM({_SIGNED_TOTAL}) FROM expense_monthly WHERE userid = %s AND month >= %s", [month])]
+        if day < month:
+            later.append((f"SELECT SUM({_SIGNED_TOTAL}) FROM expense_daily "
+                          f"WHERE userid = %s AND day >= %s AND day < %s", [day, month]))
+        if start < _to_datetime(day):
+            later.append((f"SELECT SUM({_SIGNED_AMOUNT}) FROM expense WHERE userid = %s AND date >= %s AND date < %s",
+                          [start, _to_datetime(day)]))
+        expression = "COALESCE((SELECT income - expenses FROM user_totals WHERE userid = %s), 0)"
+        params = [userid]
+        for query, query_params in later:
+            expression += f"\n            - COALESCE(({query}), 0)"
+            params += [userid, *query_params]
+        return expression, params
+
+    def balance_trend(self, userid, start=None, end=None, bucket=None):
+        """[(date, balance)] for the rows dated in [start, end), in posting order.
+
+        Balances include everything posted before start, so a "Month" view
+        starts from the real balance rather than from zero. Pass a bucket
+        from trend_buckets to get one point per day, week or month instead of
+        one per record.
+        """
+        def fetch():
+            date, balance, order, tail, params = self._trend_clauses(userid, start, end, bucket)
+            rows = self._rows(f"SELECT {date}, {balance} {tail} ORDER BY {order}", params)
+            return [(_to_datetime(date), float(value)) for date, value in rows]
+
+        return self._cached(userid, "balance_trend", (start, end, bucket), fetch)
+
+    def dashboard_snapshot(self, userid, page_size, parts=DASHBOARD_PARTS, after=None,
+                           order_by="id", descending=True, trend_window=(None, None), trend_bucket=None):
+        """Everything the dashboard shows, fetched in one round trip.
+
+        The requested parts are combined into a single tagged UNION ALL
+        statement; each branch fills the shared columns
+        (part, seq, id, title, expense_type, amount, extra, comment, date)
+        and seq restores each part's ordering afterwards. Returns a dict with
+        the requested keys:
+
+        - totals: (income, expenses, record_count) from user_totals
+        - categories: [(expense_type, sum)] for the pie
+        - page: table page rows, as fetch_page() returns them
+        - trend: [(date, balance)] for trend_window and trend_bucket, as balance_trend() returns them
+        """
+        return self._cached(
+            userid, "dashboard_snapshot",
+            (page_size, tuple(parts), after, order_by, descending, tuple(trend_window), trend_bucket),
+            lambda: self._fetch_dashboard(userid, page_size, parts, after, order_by, descending,
+                                          trend_window, trend_bucket))
+
+    def _fetch_dashboard(self, userid, page_size, parts, after, order_by, descending, trend_window, trend_bucket):
+        branches = []
+        params = []
+        if "totals" in parts:
+            branches.append("""
+                SELECT 'totals' AS part, NULL AS seq, record_count AS id, NULL AS title, NULL AS expense_type,
+                       income AS amount, expenses AS extra, NULL AS comment, last_change AS date
+                FROM user_totals WHERE userid = %s""")
+            params.append(userid)
+        if "categories" in parts:
+            branches.append(f"""
+                SELECT 'categories', NULL, NULL, NULL, expense_type, SUM(amount), NULL, NULL, NULL
+                FROM ({_CATEGORY_SOURCE}) AS source WHERE expense_type NOT IN ({_income_list()})
+                GROUP BY expense_type""")
+            params += [userid, userid]
+        if "page" in parts:
+            where, order, page_params = self._page_clauses(userid, after, order_by, descending)
+            branches.append(f"""
+                SELECT * FROM (
+                    SELECT 'page' AS part, ROW_NUMBER() OVER (ORDER BY {order}) AS seq, id, title, expense_type,
+                           amount, NULL AS extra, comment, NULL AS date
+                    FROM expense WHERE {where} ORDER BY {order} LIMIT %s
+                ) AS page_rows""")
+            params += [*page_params, page_size]
+        if "trend" in parts:
+            date, balance, order, tail, trend_params = self._trend_clauses(userid, *trend_window, trend_bucket)
+            branches.append(f"""
+                SELECT 'trend', ROW_NUMBER() OVER (ORDER BY {order}), NULL, NULL, NULL, {balance}, NULL, NULL, {date}
+                {tail}""")
+            params += trend_params
+        if not branches:
+            return {}
+
+        snapshot = {part: [] for part in parts}
+        if "totals" in parts:
+            snapshot["totals"] = (0.0, 0.0, 0)
+        for part, seq, record_id, title, expense_type, amount, extra, comment, date in sorted(
+                self._rows(" UNION ALL ".join(branches), params), key=lambda row: (row[0], row[1] or 0)):
+            if part == "totals":
+                snapshot["totals"] = (float(amount), float(extra), int(record_id))
+            elif part == "categories":
+                snapshot["categories"].append((expense_type, amount))
+            elif part == "page":
+                snapshot["page"].append((record_id, title, expense_type, amount, comment))
+            else:
+                snapshot["trend"].append((_to_datetime(date), float(amount)))
+        if "page" in parts:
+            snapshot["page"] += self._page_tail(
+                userid, len(snapshot["page"]), page_size, after, order_by, descending)
+        return snapshot
+
+    def search(self, userid, term, limit=SEARCH_PAGE_SIZE, offset=0):
+        """Page of records whose title, category or comment match every word of term by prefix.
+
+        Served by the full-text index (see search.py), best match first and
+        newest first among equals. A term with no words matches nothing.
+        """
+        words = tokens(term)
+        if not words:
+            return []
+        query, params = self._search_query(self.match_query(words), userid)
+        return self._cached(userid, "search", (tuple(words), limit, offset), lambda: self._rows(
+            query + " LIMIT %s OFFSET %s", [*params, limit, offset]))
+
+    def _search_query(self, match, userid):
+        """(sql, params) of the ranked full-text search, without LIMIT."""
+        raise NotImplementedError
+
+    # --- Expense writes ---
+    # Every write updates user_totals in the same transaction as the expense row.
+    def _bump_totals(self, cur, userid, income, expenses, count):
+        cur.execute(self._sql(self._totals_upsert), (userid, income, expenses, count, _now()))
+
+    def _bump_rollups(self, cur, userid, changes):
+        """Apply _rollup_changes() deltas to the daily and monthly rollups.
+
+        Rows whose count drops to zero are deleted, so the rollups only hold
+        periods that still have records.
+        """
+        monthly = {}
+        for (day, expense_type), (amount, count) in changes.items():
+            change = monthly.setdefault((day.replace(day=1), expense_type), [0.0, 0])
+            change[0] += amount
+            change[1] += count
+        for (table, period), deltas in zip(ROLLUPS, (changes, monthly)):
+            rows = [(userid, key, expense_type, round(amount, 2), count)
+                    for (key, expense_type), (amount, count) in deltas.items() if amount or count]
+            if not rows:
+                continue
+            cur.executemany(self._sql(self._rollup_upsert.format(table=table, period=period)), rows)
+            emptied = [(userid, key, expense_type) for (key, expense_type), (_, count) in deltas.items() if count < 0]
+            if emptied:
+                cur.executemany(self._sql(
+                    f"DELETE FROM {table} WHERE userid = %s AND {period} = %s AND expense_type = %s AND record_count <= 0"),
+                    emptied)
+
+    def _locked_row(self, cur, userid, record_id):
+        cur.execute(self._sql(
+            "SELECT expense_type, amount, date FROM expense WHERE id = %s AND userid = %s" + self.lock_suffix),
+            (record_id, userid))
+        return cur.fetchone()
+
+    def add_expense(self, userid, title, expense_type, amount, comment, date=None):
+        date = date or _now()
+        income, expenses = split_amount(expense_type, amount)
+        with self._writing(userid) as cur:
+            cur.execute(self._sql(
+                "INSERT INTO expense (userid, date, title, expense_type, amount, comment) VALUES (%s, %s, %s, %s, %s, %s)"),
+                (userid, date, title, expense_type, amount, comment))
+            self._bump_totals(cur, userid, income, expenses, 1)
+            self._bump_rollups(cur, userid, _rollup_changes([(date, expense_type, amount, 1)]))
+
+    def update_expense(self, userid, record_id, title, expense_type, amount, comment):
+        with self._writing(userid) as cur:
+            old = self._locked_row(cur, userid, record_id)
+            if old is None:
+                return
+            cur.execute(self._sql(
+                "UPDATE expense SET title = %s, expense_type = %s, amount = %s, comment = %s WHERE id = %s AND userid = %s"),
+                (title, expense_type, amount, comment, record_id, userid))
+            old_type, old_amount, old_date = old
+            old_income, old_expenses = split_amount(old_type, old_amount)
+            income, expenses = split_amount(expense_type, amount)
+            self._bump_totals(cur, userid, income - old_income, expenses - old_expenses, 0)
+            self._bump_rollups(cur, userid, _rollup_changes([
+                (old_date, old_type, -float(old_amount or 0), -1), (old_date, expense_type, amount, 1)]))
+
+    def delete_expense(self, userid, record_id):
+        with self._writing(userid) as cur:
+            old = self._locked_row(cur, userid, record_id)
+            if old is None:
+                return
+            cur.execute(self._sql("DELETE FROM expense WHERE id = %s AND userid = %s"), (record_id, userid))
+            expense_type, amount, old_date = old
+            income, expenses = split_amount(expense_type, amount)
+            self._bump_totals(cur, userid, -income, -expenses, -1)
+            self._bump_rollups(cur, userid, _rollup_changes([(old_date, expense_type, -float(amount or 0), -1)]))
+
+    def _clear_expenses(self, cur, userid):
+        cur.execute(self._sql("DELETE FROM expense WHERE userid = %s"), (userid,))
+        for table, _ in ROLLUPS:
+            cur.execute(self._sql(f"DELETE FROM {table} WHERE userid = %s"), (userid,))
+        cur.execute(self._sql(
+            "UPDATE user_totals SET income = 0, expenses = 0, record_count = 0, last_change = %s WHERE userid = %s"),
+            (_now(), userid))
+
+    def delete_all_expenses(self, userid):
+        with self._writing(userid) as cur:
+            self._clear_expenses(cur, userid)
+
+    def insert_expenses(self, userid, rows, replace=False):
+        """Insert (date, title, expense_type, amount, comment) rows in one transaction; returns the count.
+
+        rows may be any iterable, e.g. a generator reading a file; it is
+        consumed in executemany() batches of BULK_CHUNK. Ids are assigned by
+        the database. With replace=True the user's existing records are
+        deleted first in the same transaction. user_totals and the rollups
+        are bumped once.
+        """
+        insert = self._sql(
+            "INSERT INTO expense (userid, date, title, expense_type, amount, comment) VALUES (%s, %s, %s, %s, %s, %s)")
+        income = expenses = 0.0
+        count = 0
+        changes = {}
+        with self._writing(userid) as cur:
+            state = self._bulk_begin(cur, userid, replace)
+            rows = iter(rows)
+            while True:
+                batch = [(userid, *row) for row in itertools.islice(rows, BULK_CHUNK)]
+                if not batch:
+                    break
+                cur.executemany(insert, batch)
+                for row in batch:
+                    row_income, row_expenses = split_amount(row[3], row[4])
+                    income += row_income
+                    expenses += row_expenses
+                for key, (amount, added) in _rollup_changes((row[1], row[3], row[4], 1) for row in batch).items():
+                    change = changes.setdefault(key, [0.0, 0])
+                    change[0] += amount
+                    change[1] += added
+                count += len(batch)
+            if count:
+                self._bump_totals(cur, userid, income, expenses, count)
+                self._bump_rollups(cur, userid, changes)
+            self._bulk_end(cur, userid, state)
+        return count
+
+    def _bulk_begin(self, cur, userid, replace):
+        """Start a bulk load inside its transaction; returns state for _bulk_end()."""
+        if replace:
+            self._clear_expenses(cur, userid)
+
+    def _bulk_end(self, cur, userid, state):
+        pass
+
+    # --- Maintenance ---
+    def rebuild_totals(self, userid=None):
+        """Recompute user_totals from expense; returns [(userid, stored, actual)] that had drifted."""
+        where, params = ("WHERE userid = %s", (userid,)) if userid is not None else ("WHERE userid IS NOT NULL", ())
+        stored = {row[0]: tuple(row[1:]) for row in self._rows(
+            f"SELECT userid, income, expenses, record_count FROM user_totals {where}", params)}
+        actual = {row[0]: tuple(row[1:]) for row in self._rows(
+            f"SELECT userid, {_TOTALS_COLUMNS} FROM expense {where} GROUP BY userid", params)}
+
+        def normalize(totals):
+            income, expenses, count = totals or (0, 0, 0)
+            return round(float(income or 0), 2), round(float(expenses or 0), 2), int(count or 0)
+
+        drift = []
+        for user in sorted(set(stored) | set(actual), key=str):
+            if normalize(stored.get(user)) != normalize(actual.get(user)):
+                drift.append((user, normalize(stored.get(user)), normalize(actual.get(user))))
+
+        with self._writing(userid) as cur:
+            cur.execute(self._sql(f"DELETE FROM user_totals {where}"), params)
+            cur.execute(self._sql(f"""
+                INSERT INTO user_totals (userid, income, expenses, record_count, last_change)
+                SELECT userid, {_TOTALS_COLUMNS}, %s FROM expense {where} GROUP BY userid
+            """), (_now(), *params))
+        return drift
+
+    def verify_rollups(self, userid=None):
+        """Compare the rollups with expense; returns [(table, userid, period, category, stored, actual)].
+
+        stored and actual are (total, record_count) pairs, (0.0, 0) for a
+        missing row. An empty list means the rollups are exact.
+        """
+        where, params = ("WHERE userid = %s", (userid,)) if userid is not None else ("WHERE userid IS NOT NULL", ())
+        mismatches = []
+        for (table, period), bucket in zip(ROLLUPS, ("day", "month")):
+            stored = {(row[0], str(row[1])[:10], row[2]): row[3:] for row in self._rows(
+                f"SELECT userid, {period}, expense_type, total, record_count FROM {table} {where}", params)}
+            expression = self.trend_buckets[bucket]
+            actual = {(row[0], str(row[1])[:10], row[2]): row[3:] for row in self._rows(f"""
+                SELECT userid, {expression}, expense_type, SUM(amount), COUNT(*)
+                FROM expense {where} AND date IS NOT NULL AND expense_type IS NOT NULL
+                GROUP BY userid, {expression}, expense_type
+            """, params)}
+
+            def normalize(row):
+                total, count = row or (0, 0)
+                return round(float(total or 0), 2), int(count or 0)
+
+            for key in sorted(set(stored) | set(actual), key=lambda key: tuple(map(str, key))):
+                if normalize(stored.get(key)) != normalize(actual.get(key)):
+                    mismatches.append((table, *key, normalize(stored.get(key)), normalize(actual.get(key))))
+        return mismatches
+
+    def rebuild_rollups(self, userid=None):
+        """Recompute the daily and monthly rollups from expense; returns verify_rollups() from before."""
+        where, params = ("WHERE userid = %s", (userid,)) if userid is not None else ("WHERE userid IS NOT NULL", ())
+        mismatches = self.verify_rollups(userid)
+        with self._writing(userid) as cur:
+            for (table, period), bucket in zip(ROLLUPS, ("day", "month")):
+                expression = self.trend_buckets[bucket]
+                cur.execute(self._sql(f"DELETE FROM {table} {where}"), params)
+                cur.execute(self._sql(f"""
+                    INSERT INTO {table} (userid, {period}, expense_type, total, record_count)
+                    SELECT userid, {expression}, expense_type, COALESCE(SUM(amount), 0), COUNT(*)
+                    FROM expense {where} AND date IS NOT NULL AND expense_type IS NOT NULL
+                    GROUP BY userid, {expression}, expense_type
+                """), params)
+        return mismatches
+
+
+class MySQLBackend(StorageBackend):
+    """MySQL/MariaDB backend using mysql-connector-python."""
+
+    dialect = "mysql"
+    lock_suffix = " FOR UPDATE"
+    _totals_upsert = """
+        INSERT INTO user_totals (userid, income, expenses, record_count, last_change)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            income = income + VALUES(income),
+            expenses = expenses + VALUES(expenses),
+            record_count = record_count + VALUES(record_count),
+            last_change = VALUES(last_change)
+    """
+    trend_buckets = {
+        "day": "DATE(date)",
+        "week": "DATE(date) - INTERVAL WEEKDAY(date) DAY",
+        "month": "DATE(date) - INTERVAL (DAYOFMONTH(date) - 1) DAY",
+    }
+    _rollup_upsert = """
+        INSERT INTO {table} (userid, {period}, expense_type, total, record_count)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total = total + VALUES(total),
+            record_count = record_count + VALUES(record_count)
+    """
+    rollup_week = "day - INTERVAL WEEKDAY(day) DAY"
+    match_query = staticmethod(boolean_query)
+
+    def __init__(self, pool_size=POOL_SIZE, **config):
+        import mysql.connector
+        from mysql.connector import errors
+
+        config = {**MYSQL_CONFIG, **config}
+
+        def connect():
+            # Autocommit keeps pooled readers from pinning an old snapshot;
+            # writes open an explicit transaction instead.
+            return mysql.connector.connect(autocommit=True, **config)
+
+        self.pool = ConnectionPool(
+            connect, size=pool_size,
+            ping=lambda conn: conn.ping(reconnect=False),
+            is_disconnect=lambda exc: isinstance(exc, (errors.OperationalError, errors.InterfaceError)),
+            begin=lambda conn: conn.start_transaction(),
+        )
+
+    def _search_query(self, match, userid):
+        # The relevance expression is identical to the WHERE one, so MySQL computes it once
+        return """
+            SELECT id, title, expense_type, amount, comment
+            FROM expense
+            WHERE MATCH (title, expense_type, comment) AGAINST (%s IN BOOLEAN MODE) AND userid = %s
+            ORDER BY MATCH (title, expense_type, comment) AGAINST (%s IN BOOLEAN MODE) DESC, id DESC
+        """, (match, userid, match)
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" ", "seconds"))
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter("DATETIME", _parse_datetime)
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+
+
+class SQLiteBackend(StorageBackend):
+    """Embedded SQLite backend for single-user installs and local testing."""
+
+    dialect = "sqlite"
+    placeholder = "?"
+    explain_prefix = "EXPLAIN QUERY PLAN"
+    _totals_upsert = """
+        INSERT INTO user_totals (userid, income, expenses, record_count, last_change)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (userid) DO UPDATE SET
+            income = income + excluded.income,
+            expenses = expenses + excluded.expenses,
+            record_count = record_count + excluded.record_count,
+            last_change = excluded.last_change
+    """
+    trend_buckets = {
+        "day": "date(date)",
+        "week": "date(date, 'weekday 0', '-6 days')",
+        "month": "date(date, 'start of month')",
+    }
+    _rollup_upsert = """
+        INSERT INTO {table} (userid, {period}, expense_type, total, record_count)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (userid, {period}, expense_type) DO UPDATE SET
+            total = total + excluded.total,
+            record_count = record_count + excluded.record_count
+    """
+    rollup_week = "date(day, 'weekday 0', '-6 days')"
+    match_query = staticmethod(fts5_query)
+    _memory_ids = itertools.count()
+
+    def __init__(self, path=SQLITE_PATH, pool_size=POOL_SIZE):
+        self.path = path
+        uri = False
+        if path == ":memory:":
+            # Pooled connections must all see the same in-memory database
+            path = f"file:xpense-memory-{next(self._memory_ids)}?mode=memory&cache=shared"
+            uri = True
+
+        def connect():
+            conn = sqlite3.connect(path, uri=uri, detect_types=sqlite3.PARSE_DECLTYPES,
+                                   check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA foreign_keys = ON")
+            return conn
+
+        # Held open for the backend's lifetime so an in-memory database
+        # survives while the pool recycles connections.
+        self._anchor = connect()
+        if not uri:
+            self._anchor.execute("PRAGMA journal_mode = WAL")
+        self.pool = ConnectionPool(connect, size=pool_size,
+                                   ping=lambda conn: conn.execute("SELECT 1"),
+                                   begin=lambda conn: conn.execute("BEGIN IMMEDIATE"))
+
+    def _bulk_begin(self, cur, userid, replace):
+        # Suspend the per-row search triggers for this transaction only
+        cur.execute("UPDATE search_sync SET deferred = 1")
+        if replace:
+            cur.execute("""
+                INSERT INTO expense_fts (expense_fts, rowid, title, expense_type, comment)
+                SELECT 'delete', id, title, expense_type, comment FROM expense WHERE userid = ?
+            """, (userid,))
+            self._clear_expenses(cur, userid)
+        # AUTOINCREMENT ids only grow, so the new rows are the ones above this
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM expense")
+        return cur.fetchone()[0]
+
+    def _bulk_end(self, cur, userid, last_id):
+        cur.execute("""
+            INSERT INTO expense_fts (rowid, title, expense_type, comment)
+            SELECT id, title, expense_type, comment FROM expense WHERE id > ? AND userid = ?
+        """, (last_id, userid))
+        cur.execute("UPDATE search_sync SET deferred = 0")
+
+    def _search_query(self, match, userid):
+        return """
+            SELECT expense.id, expense.title, expense.expense_type, expense.amount, expense.comment
+            FROM expense_fts
+            JOIN expense ON expense.id = expense_fts.rowid
+            WHERE expense_fts MATCH %s AND expense.userid = %s
+            ORDER BY bm25(expense_fts), expense.id DESC
+        """, (match, userid)
+
+    def close(self):
+        super().close()
+        self._anchor.close()
+
+
+BACKENDS = {
+    "mysql": MySQLBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def connect_backend(name=None, migrate=True, **options):
+    """Create the backend named by `name` or the XPENSE_BACKEND environment variable.
+
+    Pending schema migrations are applied unless migrate=False. Reads are
+    cached in a QueryCache of XPENSE_CACHE_MB megabytes (0 disables it).
+    """
+    name = (name or os.environ.get("XPENSE_BACKEND", "mysql")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {name}")
+    if name == "sqlite" and "path" not in options:
+        options["path"] = os.environ.get("XPENSE_SQLITE_PATH", SQLITE_PATH)
+    if "pool_size" not in options:
+        options["pool_size"] = int(os.environ.get("XPENSE_POOL_SIZE", POOL_SIZE))
+    backend = BACKENDS[name](**options)
+    if migrate:
+        from migrations import apply_migrations
+        apply_migrations(backend)
+    budget = int(os.environ.get("XPENSE_CACHE_MB", CACHE_BUDGET // (1024 * 1024))) * 1024 * 1024
+    if budget > 0:
+        backend.cache = QueryCache(budget)
+    return backend
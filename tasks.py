@@ -0,0 +1,227 @@
+"""Background work for the Tk UI.
+
+Tk widgets may only be touched from the main thread, so database work runs
+on worker threads and the results are handed back through app.after.
+"""
+import itertools
+import queue
+import threading
+
+
+class BackgroundExecutor:
+    """Run blocking work on worker threads and deliver results on the Tk thread.
+
+    Every request carries a key ("table", "summary", ...). Submitting a new
+    request with the same key makes the older one stale: it is skipped if it
+    has not started yet, and its result is dropped if it has. Writes use
+    key=None so they are never dropped.
+
+    Long jobs report progress through reporter(): the worker calls the
+    returned function as often as it likes and the latest values are passed
+    to the callback on the Tk thread at the next poll.
+    """
+
+    def __init__(self, root, workers=2, poll_ms=15):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = None
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._latest = {}
+        self._epoch = 0
+        self._pending = 0
+        self._polling = False
+        self._busy = False
+        self._progress = {}
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"xpense-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key, work, on_done=None, on_error=None):
+        """Call work() on a worker thread, then on_done(result) or on_error(exc) on the Tk thread."""
+        job_id = next(self._ids)
+        if key is not None:
+            with self._lock:
+                self._latest[key] = job_id
+        self._pending += 1
+        self._set_busy(True)
+        self._jobs.put((key, job_id, self._epoch, work, on_done, on_error))
+        self._schedule_poll()
+
+    def reporter(self, on_progress):
+        """Thread-safe function that forwards its arguments to on_progress on the Tk thread.
+
+        Reports made between two polls are coalesced to the latest one, and
+        none are delivered after cancel_all().
+        """
+        epoch = self._epoch
+
+        def report(*args):
+            with self._lock:
+                if epoch == self._epoch:
+                    self._progress[on_progress] = args
+        return report
+
+    def cancel(self, key):
+        """Drop any queued or running request for key."""
+        with self._lock:
+            self._latest[key] = next(self._ids)
+
+    def cancel_all(self):
+        """Drop every pending callback, e.g. when the widgets they update are destroyed.
+
+        Work that already started (including writes) still runs to completion
+        and is still counted as pending, but on_busy is detached too: set it
+        again for the new widgets.
+        """
+        with self._lock:
+            for key in self._latest:
+                self._latest[key] = next(self._ids)
+            self._epoch += 1
+            self._progress.clear()
+        self.on_busy = None
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._jobs.put(None)
+
+    def _is_stale(self, key, job_id):
+        if key is None:
+            return False
+        with self._lock:
+            return self._latest.get(key) != job_id
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            key, job_id = job[0], job[1]
+            if self._is_stale(key, job_id):
+                self._results.put((job, None, None))
+                continue
+            try:
+                self._results.put((job, True, job[3]()))
+            except Exception as e:
+                self._results.put((job, False, e))
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        with self._lock:
+            progress, self._progress = self._progress, {}
+        for on_progress, args in progress.items():
+            try:
+                on_progress(*args)
+            except Exception as e:
+                print(f"Error handling background progress: {e}")
+        while True:
+            try:
+                job, ok, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            key, job_id, epoch, _, on_done, on_error = job
+            if ok is None or epoch != self._epoch or self._is_stale(key, job_id):
+                continue
+            callback = on_done if ok else on_error
+            try:
+                if callback is not None:
+                    callback(value)
+                elif not ok:
+                    print(f"Background task failed: {value}")
+            except Exception as e:
+                print(f"Error handling background result: {e}")
+        self._set_busy(self._pending > 0)
+        if self._pending:
+            self._schedule_poll()
+
+    def _set_busy(self, busy):
+        if busy != self._busy:
+            self._busy = busy
+            if self.on_busy is not None:
+                self.on_busy(busy)
+
+
+class Preload:
+    """Run work() on a daemon thread right away; result() waits for it.
+
+    Used to do slow setup (connecting to the database, importing the
+    plotting stack) while the login screen is already showing. If the
+    background attempt fails, result() raises that error once and later
+    calls retry work() on the calling thread.
+    """
+
+    def __init__(self, work, name="preload"):
+        self._work = work
+        self._done = False
+        self._value = None
+        self._error = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"xpense-{name}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._value = self._work()
+            self._done = True
+        except Exception as e:
+            self._error = e
+
+    def result(self):
+        self._thread.join()
+        with self._lock:
+            if self._done:
+                return self._value
+            if self._error is not None:
+                error, self._error = self._error, None
+                raise error
+            self._value = self._work()
+            self._done = True
+            return self._value
+
+
+class RefreshScheduler:
+    """Coalesce view refresh requests into one refresh per idle pass of the Tk loop.
+
+    Handlers call request() with the views their change affects. The first
+    request schedules a flush with after_idle; requests made before it runs
+    are merged, so a burst of changes costs one refresh(views) call covering
+    the union of their views. Tk thread only.
+    """
+
+    def __init__(self, root, refresh, views):
+        self.root = root
+        self.views = frozenset(views)
+        self._refresh = refresh
+        self._pending = set()
+        self._job = None
+
+    def request(self, *views):
+        """Schedule a refresh of views (all of them when none are given)."""
+        unknown = set(views) - self.views
+        if unknown:
+            raise ValueError(f"Unknown views: {', '.join(sorted(unknown))}")
+        self._pending.update(views or self.views)
+        if self._job is None:
+            self._job = self.root.after_idle(self._flush)
+
+    def cancel(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        self._pending.clear()
+
+    def _flush(self):
+        self._job = None
+        views, self._pending = frozenset(self._pending), set()
+        if views:
+            self._refresh(views)
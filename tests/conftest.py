@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db():
+    """A migrated, cached SQLite backend in memory with an empty user "alice"."""
+    from storage import connect_backend
+
+    backend = connect_backend("sqlite", path=":memory:")
+    backend.create_user("alice", "secret", "Alice")
+    yield backend
+    backend.close()
@@ -0,0 +1,84 @@
+"""Charts must stay the same size however long a session runs.
+
+Drives ChartManager.update_pie / update_trend through thousands of
+refreshes with a changing number of categories and points, and checks
+that the artists on each axes, the pyplot figure registry and the
+process's memory stay bounded. Needs customtkinter and a display; the
+figures themselves are rendered with Agg.
+"""
+import resource
+import sys
+import tkinter as tk
+from datetime import datetime, timedelta
+
+import pytest
+
+matplotlib = pytest.importorskip("matplotlib")
+matplotlib.use("Agg")
+pytest.importorskip("customtkinter")
+
+from matplotlib._pylab_helpers import Gcf  # noqa: E402
+
+REFRESHES = 3000
+WARM_UP = 200
+# Headroom for allocator noise; a leak of even one artist per refresh is far larger
+RSS_GROWTH_LIMIT_MB = 25
+
+
+def _max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _pie_artists(charts):
+    return len(charts.pie_ax.patches) + len(charts.pie_ax.texts)
+
+
+def _trend_artists(charts):
+    ax = charts.trend_ax
+    return len(ax.lines) + len(ax.collections) + len(ax.texts) + len(ax.patches)
+
+
+@pytest.fixture
+def charts():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("needs a display")
+    root.withdraw()
+    from charts import ChartManager
+
+    manager = ChartManager(root, on_trend_period=lambda period: None, dark_color="#2b2b2b",
+                           darker_color="#1f1f1f", primary_color="#4CAF50", secondary_color="#45a049")
+    yield manager
+    manager.close()
+    root.destroy()
+
+
+def _refresh(charts, i):
+    categories = [(f"Category {n}", 100 + 37 * ((i + n) % 11)) for n in range(3 + i % 9)]
+    charts.update_pie(categories)
+    start = datetime(2024, 1, 1)
+    points = 50 + (i * 97) % 2000
+    charts.update_trend([start + timedelta(hours=h) for h in range(points)],
+                        [1000 + ((h * 31 + i) % 200) for h in range(points)])
+    if i % 100 == 0:
+        # Let draw_idle() actually render now and then
+        charts.master.update()
+
+
+def test_refreshes_do_not_accumulate_artists_figures_or_memory(charts):
+    figures = Gcf.get_num_fig_managers()
+    for i in range(WARM_UP):
+        _refresh(charts, i)
+    pie_limit = 3 * 11  # wedges, shadows and label texts for the most categories shown
+    trend_artists = _trend_artists(charts)
+    rss = _max_rss_mb()
+
+    for i in range(WARM_UP, REFRESHES):
+        _refresh(charts, i)
+        assert _pie_artists(charts) <= pie_limit
+        assert _trend_artists(charts) == trend_artists
+
+    assert Gcf.get_num_fig_managers() == figures
+    assert _max_rss_mb() - rss < RSS_GROWTH_LIMIT_MB
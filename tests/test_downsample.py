@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from downsample import lttb
+
+
+def test_short_series_are_kept_whole():
+    x = np.arange(10.0)
+    assert list(lttb(x, x, 10)) == list(range(10))
+    assert list(lttb(x, x, 50)) == list(range(10))
+    assert list(lttb(x, x, 2)) == list(range(10))
+
+
+@pytest.mark.parametrize("n, threshold", [(1000, 100), (10000, 800), (101, 3), (5000, 4999)])
+def test_thinned_to_threshold_in_order_with_both_ends(n, threshold):
+    rng = np.random.default_rng(n)
+    x = np.sort(rng.uniform(0, 1000, n))
+    y = np.cumsum(rng.normal(size=n))
+    keep = lttb(x, y, threshold)
+    assert len(keep) == threshold
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_peaks_and_troughs_survive():
+    x = np.arange(2000.0)
+    y = np.zeros(2000)
+    y[500], y[1500] = 100.0, -100.0
+    keep = lttb(x, y, 50)
+    assert 500 in keep and 1500 in keep
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from importer import import_csv
+
+HEADER = "date,title,amount,expense_type,comment\n"
+BUS = "2024-03-04,Bus,2.50,Transport,\n"
+LUNCH = "2024-03-04,Lunch,12.00,Restaurants,\n"
+
+
+def _write(tmp_path, name, *lines):
+    path = tmp_path / name
+    path.write_text(HEADER + "".join(lines), encoding="utf-8")
+    return str(path)
+
+
+def test_identical_rows_within_a_file_are_all_kept(db, tmp_path):
+    result = import_csv(db, "alice", _write(tmp_path, "march.csv", BUS, BUS, LUNCH))
+    assert (result.inserted, result.duplicates) == (3, 0)
+    assert db.count_expenses("alice") == 3
+
+
+def test_reimporting_a_file_adds_nothing(db, tmp_path):
+    path = _write(tmp_path, "march.csv", BUS, BUS, LUNCH)
+    import_csv(db, "alice", path)
+    result = import_csv(db, "alice", path)
+    assert (result.inserted, result.duplicates) == (0, 3)
+    assert db.count_expenses("alice") == 3
+
+
+def test_each_ledger_record_matches_one_file_row(db, tmp_path):
+    import_csv(db, "alice", _write(tmp_path, "first.csv", BUS, BUS))
+    # Same key: title case and spacing don't matter
+    result = import_csv(db, "alice", _write(tmp_path, "second.csv", BUS, "2024-03-04,  bus ,2.5,Transport,\n", BUS))
+    assert (result.inserted, result.duplicates) == (1, 2)
+    assert db.count_expenses("alice") == 3
+
+
+def test_records_added_in_the_app_count_as_existing(db, tmp_path):
+    db.add_expense("alice", "Bus", "Transport", 2.5, None, date=datetime(2024, 3, 4))
+    result = import_csv(db, "alice", _write(tmp_path, "march.csv", BUS, BUS))
+    assert (result.inserted, result.duplicates) == (1, 1)
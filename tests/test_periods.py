@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from periods import ALL_TIME, PERIODS, custom_bounds, period_bounds, trend_bucket
+
+NOW = datetime(2024, 8, 14, 15, 30)
+
+
+@pytest.mark.parametrize("period, bounds", [
+    ("Day", (datetime(2024, 8, 14), datetime(2024, 8, 15))),
+    ("Week", (datetime(2024, 8, 8), datetime(2024, 8, 15))),
+    ("Month", (datetime(2024, 8, 1), datetime(2024, 9, 1))),
+    ("Quarter", (datetime(2024, 7, 1), datetime(2024, 10, 1))),
+    ("Half-Year", (datetime(2024, 7, 1), datetime(2025, 1, 1))),
+    ("Year", (datetime(2024, 1, 1), datetime(2025, 1, 1))),
+    (ALL_TIME, (None, None)),
+])
+def test_named_periods(period, bounds):
+    assert period_bounds(period, now=NOW) == bounds
+    assert period_bounds(f" {period.upper()} ", now=NOW) == bounds
+
+
+def test_periods_roll_over_the_year():
+    assert period_bounds("Month", now=datetime(2024, 12, 31, 23, 59)) == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+    assert period_bounds("Quarter", now=datetime(2024, 11, 2)) == (datetime(2024, 10, 1), datetime(2025, 1, 1))
+
+
+@pytest.mark.parametrize("period", ["Fortnight", "", "All time", "Months"])
+def test_unknown_period_names_are_rejected(period):
+    with pytest.raises(ValueError, match="unknown period"):
+        period_bounds(period, now=NOW)
+
+
+def test_every_picker_period_is_known():
+    for period in PERIODS:
+        start, end = period_bounds(period, now=NOW)
+        assert start <= NOW < end
+
+
+@pytest.mark.parametrize("text, bounds", [
+    ("2024-01-01..2024-03-31", (datetime(2024, 1, 1), datetime(2024, 4, 1))),
+    (" 2024-01-01 .. 2024-01-01 ", (datetime(2024, 1, 1), datetime(2024, 1, 2))),
+    ("2024-01-01 08:00..2024-01-01 17:30", (datetime(2024, 1, 1, 8), datetime(2024, 1, 1, 17, 30))),
+    ("2024-07-01..", (datetime(2024, 7, 1), None)),
+    ("..2024-06-30", (None, datetime(2024, 7, 1))),
+    ("..", (None, None)),
+])
+def test_custom_ranges(text, bounds):
+    assert custom_bounds(text) == bounds
+    assert period_bounds(text, now=NOW) == bounds
+
+
+@pytest.mark.parametrize("text", ["2024-01-01", "2024-13-01..2024-12-31", "yesterday..today",
+                                  "2024-03-01..2024-02-01"])
+def test_malformed_custom_ranges(text):
+    with pytest.raises(ValueError):
+        custom_bounds(text)
+
+
+def test_trend_bucket_keeps_raw_rows_for_short_windows():
+    assert trend_bucket(datetime(2024, 8, 1), datetime(2024, 9, 1), 800) is None
+    assert trend_bucket(datetime(2024, 8, 1), datetime(2024, 9, 1), 0) is None
+
+
+def test_trend_bucket_picks_the_finest_bucket_that_fits():
+    start = datetime(2020, 1, 1)
+    assert trend_bucket(start, start + timedelta(days=600), 800) == "day"
+    assert trend_bucket(start, start + timedelta(days=2000), 800) == "week"
+    assert trend_bucket(start, start + timedelta(days=20000), 800) == "month"
+    assert trend_bucket(start, start + timedelta(days=200000), 800) == "month"
+
+
+def test_trend_bucket_open_ranges():
+    # No history to measure: monthly buckets
+    assert trend_bucket(None, None, 800) == "month"
+    # An open start is the first record, an open end is now
+    assert trend_bucket(None, None, 800, first=NOW - timedelta(days=30), now=NOW) is None
+    assert trend_bucket(None, None, 800, first=NOW - timedelta(days=2000), now=NOW) == "week"
+    assert trend_bucket(NOW - timedelta(days=600), None, 800, now=NOW) == "day"
@@ -0,0 +1,29 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from snapshot import read_snapshot, restore_snapshot, write_snapshot  # noqa: E402
+
+AMOUNTS = ["167.17", "0.10", "-0.30", "99999.99", "1234.05", "-2.68"]
+
+
+def test_export_then_restore_keeps_amounts_exact(db, tmp_path):
+    for day, amount in enumerate(AMOUNTS, 1):
+        db.add_expense("alice", f"Item {day}", "Groceries", Decimal(amount), "", date=datetime(2024, 3, day))
+    path = str(tmp_path / "alice.arrow")
+    assert write_snapshot(db, "alice", path) == len(AMOUNTS)
+
+    db.create_user("bob", "secret", "Bob")
+    assert restore_snapshot(db, "bob", path) == len(AMOUNTS)
+
+    def amounts(userid):
+        return [row[5] for rows in db.iter_expenses(userid) for row in rows]
+
+    assert amounts("bob") == amounts("alice")
+    restored = str(tmp_path / "bob.arrow")
+    write_snapshot(db, "bob", restored)
+    assert read_snapshot(restored).column("amount").to_pylist() == \
+        read_snapshot(path).column("amount").to_pylist()
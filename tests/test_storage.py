@@ -0,0 +1,169 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from storage import INCOME_TYPES, SORT_COLUMNS, page_key
+
+CATEGORIES = ["Income", "Allowance", "Supermarket", "Transport", "Cafes"]
+FIRST_DAY = datetime(2024, 1, 20)
+
+
+def _records(count, seed=7):
+    """(date, title, expense_type, amount, comment) rows with repeats and NULLs in every sort column."""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        when = FIRST_DAY + timedelta(minutes=rng.randrange(0, 60 * 24 * 120))
+        rows.append((
+            when,
+            rng.choice(["Rent", "Bus", "bus", "Coffee", "Salary", None]),
+            rng.choice(CATEGORIES + [None]),
+            rng.choice([None, 5, 12.5, round(rng.uniform(1, 400), 2)]),
+            rng.choice([None, "", "card", "cash"]),
+        ))
+    # Undated records count as the oldest
+    rows += [(None, "Opening", "Income", 1000, None), (None, "Old", "Cafes", 40, None)]
+    return rows
+
+
+@pytest.fixture
+def ledger(db):
+    db.insert_expenses("alice", _records(400))
+    return db
+
+
+def _all_rows(db):
+    return db._rows("SELECT id, title, expense_type, amount, comment, date FROM expense WHERE userid = %s",
+                    ("alice",))
+
+
+def _signed(expense_type, amount):
+    if expense_type is None:
+        return 0.0
+    return float(amount or 0) * (1 if expense_type in INCOME_TYPES else -1)
+
+
+@pytest.mark.parametrize("order_by", SORT_COLUMNS)
+@pytest.mark.parametrize("descending", [True, False])
+def test_keyset_pages_cover_every_row_in_sort_order(ledger, order_by, descending):
+    rows = _all_rows(ledger)
+    index = ["id", "title", "expense_type", "amount", "comment"].index(order_by)
+    # NULLs sort lowest, ties are broken by id
+    expected = [row[0] for row in sorted(
+        rows, key=lambda row: (row[index] is not None, row[index] or 0 if order_by == "amount" else row[index] or "",
+                               row[0]), reverse=descending)]
+    seen, after = [], None
+    while True:
+        page = ledger.fetch_page("alice", 7, after, order_by=order_by, descending=descending)
+        if not page:
+            break
+        assert len(page) <= 7
+        seen += [row[0] for row in page]
+        after = page_key(page[-1], order_by)
+    assert seen == expected
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_dashboard_page_matches_fetch_page(ledger, descending):
+    after = None
+    for _ in range(30):
+        page = ledger.fetch_page("alice", 11, after, order_by="comment", descending=descending)
+        snapshot = ledger.dashboard_snapshot("alice", 11, parts=("page",), after=after, order_by="comment",
+                                             descending=descending)
+        assert [tuple(row) for row in snapshot["page"]] == [tuple(row) for row in page]
+        if not page:
+            break
+        after = page_key(page[-1], "comment")
+
+
+def _period(moment, bucket):
+    day = datetime(moment.year, moment.month, moment.day)
+    if bucket == "day":
+        return day, day + timedelta(days=1)
+    if bucket == "week":
+        monday = day - timedelta(days=day.weekday())
+        return monday, monday + timedelta(days=7)
+    first = day.replace(day=1)
+    return first, (first + timedelta(days=32)).replace(day=1)
+
+
+def _naive_trend(rows, start, end, bucket):
+    """The balance trend recomputed from every record in Python."""
+    dated = [row for row in rows if row[5] is not None]
+    if bucket is None:
+        balance = sum(_signed(row[2], row[3]) for row in rows
+                      if row[5] is None or (start is not None and row[5] < start))
+        points = []
+        for row in sorted(dated, key=lambda row: (row[5], row[0])):
+            if (start is None or row[5] >= start) and (end is None or row[5] < end):
+                balance += _signed(row[2], row[3])
+                points.append((row[5], balance))
+        return points
+    # Weeks are summed from daily rollups, so a week cut by the end closes with the window's last day
+    unit = "month" if bucket == "month" else "day"
+    last = None if end is None else _period(end - timedelta(microseconds=1), unit)[1]
+    periods = sorted({_period(row[5], bucket) for row in dated if row[2] is not None
+                      and (start is None or _period(row[5], unit)[1] > start) and (last is None or row[5] < last)})
+    return [(first, sum(_signed(row[2], row[3]) for row in rows
+                        if row[5] is None or row[5] < (stop if last is None else min(stop, last))))
+            for first, stop in periods]
+
+
+WINDOWS = [
+    (None, None),
+    (datetime(2024, 2, 10, 13, 30), datetime(2024, 3, 5)),
+    (datetime(2024, 3, 1), None),
+    (None, datetime(2024, 2, 1)),
+    (datetime(2024, 2, 29, 23, 59, 59), datetime(2024, 4, 17, 6)),
+    (datetime(2023, 1, 1), datetime(2023, 6, 1)),
+]
+
+
+@pytest.mark.parametrize("start, end", WINDOWS)
+@pytest.mark.parametrize("bucket", [None, "day", "week", "month"])
+def test_balance_trend_matches_a_naive_recomputation(ledger, start, end, bucket):
+    expected = _naive_trend(_all_rows(ledger), start, end, bucket)
+    got = ledger.balance_trend("alice", start, end, bucket=bucket)
+    assert [moment for moment, _ in got] == [moment for moment, _ in expected]
+    assert [balance for _, balance in got] == pytest.approx([balance for _, balance in expected])
+    snapshot = ledger.dashboard_snapshot("alice", 10, parts=("trend",), trend_window=(start, end), trend_bucket=bucket)
+    assert snapshot["trend"] == pytest.approx(got) if got else snapshot["trend"] == []
+
+
+def test_first_record_date(db, ledger):
+    assert ledger.first_record_date("alice") == min(row[5] for row in _all_rows(ledger) if row[5] is not None)
+    db.create_user("bob", "secret", "Bob")
+    assert db.first_record_date("bob") is None
+
+
+def test_rollups_follow_every_kind_of_write(ledger):
+    assert ledger.verify_rollups() == []
+    rng = random.Random(3)
+    ids = [row[0] for row in _all_rows(ledger)]
+    rng.shuffle(ids)
+    for record_id in ids[:40]:
+        ledger.delete_expense("alice", record_id)
+    for record_id in ids[40:80]:
+        ledger.update_expense("alice", record_id, "Edited", rng.choice(CATEGORIES + [None]), rng.choice([None, 9.99]),
+                              None)
+    for day in range(20):
+        ledger.add_expense("alice", "Added", rng.choice(CATEGORIES), 3.25, None, date=FIRST_DAY + timedelta(days=day))
+    assert ledger.verify_rollups() == []
+    assert ledger.rebuild_totals() == []
+
+    ledger.insert_expenses("alice", _records(50, seed=11), replace=True)
+    assert ledger.verify_rollups() == []
+    assert ledger.count_expenses("alice") == 52
+    ledger.delete_all_expenses("alice")
+    assert ledger.verify_rollups() == []
+    assert ledger._rows("SELECT COUNT(*) FROM expense_daily WHERE userid = %s", ("alice",))[0][0] == 0
+
+
+def test_verify_rollups_reports_drift_and_rebuild_repairs_it(ledger):
+    ledger._execute("UPDATE expense_monthly SET total = total + 1 WHERE userid = %s AND month = %s",
+                    ("alice", datetime(2024, 2, 1).date()))
+    mismatches = ledger.verify_rollups("alice")
+    assert mismatches and {mismatch[0] for mismatch in mismatches} == {"expense_monthly"}
+    assert ledger.rebuild_rollups("alice") == mismatches
+    assert ledger.verify_rollups() == []